@@ -1,20 +1,218 @@
 import os
-from typing import List, Dict, Tuple
+from typing import Callable, Iterator, List, Dict, Tuple, Optional
 import requests
 import re
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import streamlit as st
+from gpt_cache import GPTCache
+from rate_limiter import RateLimiter, estimate_tokens, rate_limiter_from_env, CHARS_PER_TOKEN
+from openai_client import OpenAIClient, AuthenticationError, CircuitOpenError
+from tracing import Tracer, logger
 
 load_dotenv()
 
+@st.cache_resource
+def get_gpt_cache() -> GPTCache:
+    """Zwraca współdzielony cache odpowiedzi GPT"""
+    return GPTCache(os.getenv("GPT_CACHE_PATH", "gpt_cache.sqlite"))
+
+@st.cache_resource
+def get_rate_limiter() -> RateLimiter:
+    """Zwraca współdzielony limiter zapytań do API (RPM/TPM)"""
+    return rate_limiter_from_env()
+
+@st.cache_resource
+def get_openai_client(base_url: str) -> OpenAIClient:
+    """Zwraca współdzielonego klienta API (jedna pula połączeń dla wszystkich sesji)"""
+    return OpenAIClient(base_url)
+
+
+class _ResponseParser:
+    """
+    Przyrostowy parser odpowiedzi w formacie ZNALEZIONE FRAGMENTY / STATYSTYKI.
+    Przyjmuje kolejne fragmenty tekstu (np. ze strumienia) i zwraca warianty
+    z każdej ukończonej linii.
+    """
+
+    def __init__(self):
+        self.variants: List[Dict[str, str]] = []
+        self.stats = {
+            "dokładne": 0,
+            "odmiana": 0,
+            "rozdzielone": 0,
+            "przestawione": 0,
+            "rozszerzone": 0,
+            "total": 0
+        }
+        self.current_section = None
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[Dict[str, str]]:
+        """Dodaje fragment odpowiedzi i zwraca nowe warianty"""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return [variant for variant in map(self._parse_line, lines) if variant]
+
+    def close(self) -> List[Dict[str, str]]:
+        """Przetwarza ostatnią (niezakończoną) linię"""
+        line, self._buffer = self._buffer, ""
+        variant = self._parse_line(line)
+        return [variant] if variant else []
+
+    def _parse_line(self, line: str) -> Optional[Dict[str, str]]:
+        if not line:
+            return None
+        
+        if "ZNALEZIONE FRAGMENTY:" in line:
+            self.current_section = "variants"
+            return None
+        elif "STATYSTYKI ZNALEZIONYCH WYSTĄPIEŃ:" in line:
+            self.current_section = "stats"
+            return None
+        
+        if self.current_section == "variants":
+            # Szukamy linii z wariantem
+            match = re.search(r'"([^"]+)"\s*\(typ:\s*(\w+)\)', line)
+            if match:
+                fragment, typ = match.groups()
+                variant = {
+                    "fragment": fragment,
+                    "typ": typ.lower()
+                }
+                self.variants.append(variant)
+                return variant
+        
+        elif self.current_section == "stats":
+            # Szukamy linii ze statystykami
+            match = re.search(r'([^:]+):\s*(\d+)', line)
+            if match:
+                key, value = match.groups()
+                key = key.strip().lower()
+                value = int(value.strip().split()[0])  # Bierzemy tylko liczbę
+                
+                if "łącznie znaleziono" in key:
+                    self.stats["total"] = value
+                elif "dokładne" in key:
+                    self.stats["dokładne"] = value
+                elif "odmiana" in key:
+                    self.stats["odmiana"] = value
+                elif "rozdzielone" in key:
+                    self.stats["rozdzielone"] = value
+                elif "przestawione" in key:
+                    self.stats["przestawione"] = value
+                elif "rozszerzone" in key:
+                    self.stats["rozszerzone"] = value
+        return None
+
+
 class AIChecker:
     """Klasa do sprawdzania fraz używając GPT-4-mini"""
     
-    def __init__(self):
+    MODEL = "gpt-4"
+    TEMPERATURE = 0.7
+    # Zmień przy każdej modyfikacji promptu, aby unieważnić stare wpisy w cache
+    PROMPT_VERSION = "1"
+    BATCH_PROMPT_VERSION = "batch-1"
+    # Rozmiar okna kontekstu modeli (w tokenach)
+    CONTEXT_WINDOWS = {"gpt-4": 8192, "gpt-4-turbo": 128000, "gpt-4o": 128000, "gpt-4o-mini": 128000}
+    # Tokeny zarezerwowane na odpowiedź dla jednej frazy w trybie wsadowym
+    BATCH_OUTPUT_TOKENS_PER_PHRASE = 150
+    # Tokeny zarezerwowane na odpowiedź w zapytaniu o pojedynczą frazę
+    OUTPUT_TOKENS_PER_PHRASE = 500
+    # Część okna kontekstu na tekst fragmentu (reszta na instrukcje, frazy i odpowiedź)
+    MAX_TEXT_SHARE = 0.5
+    MAX_BATCH_SIZE = 50
+    VARIANT_TYPES = ["dokładne", "odmiana", "rozdzielone", "przestawione", "rozszerzone"]
+    
+    def __init__(self, cache: Optional[GPTCache] = None, api_key: Optional[str] = None,
+                 max_workers: Optional[int] = None, rate_limiter: Optional[RateLimiter] = None,
+                 batch_mode: bool = False, tracer: Optional[Tracer] = None,
+                 client: Optional[OpenAIClient] = None, stream: Optional[bool] = None):
         """Inicjalizuje checker z kluczem API"""
-        # Klucz API będzie pobierany z session_state
-        self.api_key = st.session_state.openai_api_key if 'openai_api_key' in st.session_state else None
+        # Klucz API pobieramy z session_state w wątku skryptu,
+        # bo wątki robocze nie mają dostępu do session_state
+        if api_key is None:
+            api_key = st.session_state.openai_api_key if 'openai_api_key' in st.session_state else None
+        self.api_key = api_key
+        self.client = client if client is not None else get_openai_client(
+            os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+        )
+        self.cache = cache if cache is not None else get_gpt_cache()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv("GPT_MAX_CONCURRENCY", "4"))
+        self.batch_mode = batch_mode
+        # Strumieniowanie odpowiedzi (SSE) dla zapytań o pojedyncze frazy
+        self.stream = stream if stream is not None else os.getenv("GPT_STREAM", "1") == "1"
+        self.tracer = tracer if tracer is not None else Tracer("gpt")
+        # Błędy zbierane z wątków roboczych - wyświetla je wywołujący
+        self.errors: List[str] = []
+        self._errors_lock = threading.Lock()
+
+    @classmethod
+    def context_window(cls) -> int:
+        """Rozmiar okna kontekstu modelu (w tokenach)"""
+        return cls.CONTEXT_WINDOWS.get(cls.MODEL, 8192)
+
+    @classmethod
+    def max_text_chars(cls) -> int:
+        """Najdłuższy tekst (w znakach), jaki można wysłać w jednym zapytaniu"""
+        return int(cls.context_window() * cls.MAX_TEXT_SHARE) * CHARS_PER_TOKEN
+
+    def _report_overflow(self) -> None:
+        self._report_error(
+            "⚠️ Fragment tekstu nie mieści się w oknie kontekstu modelu "
+            f"{self.MODEL} - zmniejsz ANALYSIS_CHUNK_CHARS."
+        )
+
+    def _report_error(self, message: str) -> None:
+        self.tracer.add("errors")
+        logger.warning("gpt_error", extra={"data": {"message": message}})
+        with self._errors_lock:
+            if message not in self.errors:
+                self.errors.append(message)
+
+    def _report_exception(self, error: Exception) -> None:
+        """Zamienia wyjątek zapytania na komunikat dla użytkownika"""
+        if isinstance(error, AuthenticationError):
+            self._report_error("❌ Nieprawidłowy klucz API! Sprawdź czy wprowadziłeś poprawny klucz.")
+        elif isinstance(error, CircuitOpenError):
+            self._report_error("⚠️ API GPT jest chwilowo niedostępne (seria błędów) - zapytania zostały wstrzymane.")
+        elif isinstance(error, requests.exceptions.Timeout):
+            self._report_error("⏱️ Przekroczono limit czasu odpowiedzi API GPT.")
+        elif isinstance(error, requests.exceptions.ConnectionError):
+            self._report_error("❌ Brak połączenia z API GPT.")
+        else:
+            self._report_error(f"❌ Błąd zapytania do GPT: {error}")
+
+    def _payload(self, prompt: str) -> Dict:
+        return {
+            "model": self.MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.TEMPERATURE
+        }
+
+    def _post_chat(self, prompt: str) -> str:
+        """Wysyła zapytanie do API (limit RPM/TPM, ponowienia w kliencie) i zwraca treść odpowiedzi"""
+        data = self.client.chat(self.api_key, self._payload(prompt), self.rate_limiter, self.tracer)
+        if not data.get("choices"):
+            raise ValueError("Odpowiedź API nie zawiera treści")
+        return data["choices"][0]["message"]["content"]
+
+    def _stream_phrase(self, prompt: str, on_variant: Optional[Callable[[Dict[str, str]], None]] = None
+                       ) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """Strumieniuje odpowiedź i parsuje warianty w miarę ich nadejścia"""
+        parser = _ResponseParser()
+        for delta in self.client.stream_chat(self.api_key, self._payload(prompt), self.rate_limiter, self.tracer):
+            for variant in parser.feed(delta):
+                if on_variant is not None:
+                    on_variant(variant)
+        for variant in parser.close():
+            if on_variant is not None:
+                on_variant(variant)
+        return parser.variants, parser.stats
 
     def create_search_prompt(self, text: str, phrase: str) -> str:
         return f"""ZADANIE: Znajdź w tekście WSZYSTKIE rzeczywiste wystąpienia frazy "{phrase}".
@@ -54,108 +252,66 @@ KRYTYCZNIE WAŻNE:
 - Statystyki muszą odpowiadać RZECZYWISTEJ liczbie znalezionych wystąpień
 - NIE WYMYŚLAJ żadnych wariantów - raportuj tylko to co znalazłeś"""
 
-    def check_phrase_with_gpt4mini(self, text: str, phrase: str) -> Tuple[bool, List[Dict[str, str]], Dict[str, int]]:
+    def parse_response(self, response_text: str) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """
+        Parsuje odpowiedź modelu w formacie ZNALEZIONE FRAGMENTY / STATYSTYKI.
+        
+        Returns:
+            Tuple[List[Dict[str, str]], Dict[str, int]]: (Warianty, Statystyki)
+        """
+        parser = _ResponseParser()
+        parser.feed(response_text)
+        parser.close()
+        return parser.variants, parser.stats
+
+    def check_phrase_with_gpt4mini(self, text: str, phrase: str,
+                                   on_variant: Optional[Callable[[Dict[str, str]], None]] = None
+                                   ) -> Tuple[bool, List[Dict[str, str]], Dict[str, int]]:
         """
         Sprawdza frazę używając GPT-4-mini.
+        
+        Args:
+            on_variant: Wywoływana dla każdego wariantu zaraz po jego otrzymaniu
+                (przy strumieniowaniu - zanim model zakończy odpowiedź)
         """
         try:
+            # Sprawdzamy cache - trafienie nie wymaga połączenia z API
+            cache_key = self.cache.make_key(text, phrase, self.MODEL, self.PROMPT_VERSION, self.TEMPERATURE)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.tracer.add("cache_hits")
+                if on_variant is not None:
+                    for variant in cached["variants"]:
+                        on_variant(variant)
+                return True, cached["variants"], cached["stats"]
+            self.tracer.add("cache_misses")
+            
             # Sprawdzamy czy mamy klucz API
-            if not st.session_state.get('openai_api_key'):
-                st.error("Wprowadź i zapisz klucz API w panelu konfiguracji!")
+            if not self.api_key:
+                self._report_error("Wprowadź i zapisz klucz API w panelu konfiguracji!")
                 return False, [], {}
 
-            # Tworzymy prompt
+            # Tworzymy prompt - zapytania, które nie zmieszczą się w oknie kontekstu, nie są wysyłane
             prompt = self.create_search_prompt(text, phrase)
-            
-            # Wywołujemy API OpenAI
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {st.session_state.openai_api_key}"
-                },
-                json={
-                    "model": "gpt-4",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.7
-                }
-            )
-            
-            # Sprawdzamy błędy autoryzacji
-            if response.status_code == 401:
-                st.error("❌ Nieprawidłowy klucz API! Sprawdź czy wprowadziłeś poprawny klucz.")
+            if estimate_tokens(prompt) + self.OUTPUT_TOKENS_PER_PHRASE > self.context_window():
+                self._report_overflow()
                 return False, [], {}
             
-            # Sprawdzamy inne błędy
-            response.raise_for_status()
-            
-            # Parsujemy odpowiedź
-            response_data = response.json()
-            if 'choices' not in response_data or not response_data['choices']:
-                return False, [], {}
-                
-            # Pobieramy tekst odpowiedzi
-            response_text = response_data['choices'][0]['message']['content']
-            
-            # Parsujemy odpowiedź
-            variants = []
-            stats = {
-                "dokładne": 0,
-                "odmiana": 0,
-                "rozdzielone": 0,
-                "przestawione": 0,
-                "rozszerzone": 0,
-                "total": 0
-            }
-            
-            current_section = None
-            
-            for line in response_text.split("\n"):
-                if not line:
-                    continue
-                
-                if "ZNALEZIONE FRAGMENTY:" in line:
-                    current_section = "variants"
-                    continue
-                elif "STATYSTYKI ZNALEZIONYCH WYSTĄPIEŃ:" in line:
-                    current_section = "stats"
-                    continue
-                
-                if current_section == "variants":
-                    # Szukamy linii z wariantem
-                    match = re.search(r'"([^"]+)"\s*\(typ:\s*(\w+)\)', line)
-                    if match:
-                        fragment, typ = match.groups()
-                        variants.append({
-                            "fragment": fragment,
-                            "typ": typ.lower()
-                        })
-                
-                elif current_section == "stats":
-                    # Szukamy linii ze statystykami
-                    match = re.search(r'([^:]+):\s*(\d+)', line)
-                    if match:
-                        key, value = match.groups()
-                        key = key.strip().lower()
-                        value = int(value.strip().split()[0])  # Bierzemy tylko liczbę
-                        
-                        if "łącznie znaleziono" in key:
-                            stats["total"] = value
-                        elif "dokładne" in key:
-                            stats["dokładne"] = value
-                        elif "odmiana" in key:
-                            stats["odmiana"] = value
-                        elif "rozdzielone" in key:
-                            stats["rozdzielone"] = value
-                        elif "przestawione" in key:
-                            stats["przestawione"] = value
-                        elif "rozszerzone" in key:
-                            stats["rozszerzone"] = value
+            # Wywołujemy API OpenAI i parsujemy odpowiedź
+            if self.stream:
+                variants, stats = self._stream_phrase(prompt, on_variant)
+            else:
+                variants, stats = self.parse_response(self._post_chat(prompt))
+                if on_variant is not None:
+                    for variant in variants:
+                        on_variant(variant)
             
+            self.cache.set(cache_key, {"variants": variants, "stats": stats})
             return True, variants, stats
             
         except Exception as e:
-            print(f"Błąd podczas analizy: {str(e)}")
+            logger.exception("gpt_phrase_check_failed", extra={"data": {"phrase": phrase}})
+            self._report_exception(e)
             return False, [], {}
 
     def find_all_variants(self, text: str, phrases: List[str]) -> Tuple[Dict[str, List[Dict[str, str]]], Dict[str, Dict[str, int]]]:
@@ -173,10 +329,242 @@ KRYTYCZNIE WAŻNE:
         results = {}
         stats = {}
         
-        for phrase in phrases:
-            found, variants, phrase_stats = self.check_phrase_with_gpt4mini(text, phrase)
+        for phrase, (found, variants, phrase_stats) in zip(phrases, self.check_phrases(text, phrases)):
             if found:
                 results[phrase] = variants
                 stats[phrase] = phrase_stats
                     
         return results, stats
+
+    def check_phrases(self, text: str, phrases: List[str],
+                      on_variant: Optional[Callable[[str, Dict[str, str]], None]] = None
+                      ) -> List[Tuple[bool, List[Dict[str, str]], Dict[str, int]]]:
+        """
+        Sprawdza wiele fraz równolegle (pula wątków ograniczona przez max_workers).
+        W trybie wsadowym wiele fraz trafia do jednego promptu.
+        
+        Args:
+            on_variant: Wywoływana (fraza, wariant) z wątków roboczych dla każdego otrzymanego wariantu
+        
+        Returns:
+            List[Tuple[bool, List[Dict[str, str]], Dict[str, int]]]:
+                Wyniki check_phrase_with_gpt4mini w kolejności fraz
+        """
+        return list(self.iter_check_phrases(text, phrases, on_variant))
+
+    def iter_check_phrases(self, text: str, phrases: List[str],
+                           on_variant: Optional[Callable[[str, Dict[str, str]], None]] = None
+                           ) -> Iterator[Tuple[bool, List[Dict[str, str]], Dict[str, int]]]:
+        """
+        Jak check_phrases, ale zapytania są wysyłane od razu, a wyniki zwracane kolejno
+        (w kolejności fraz), gdy tylko zakończą się zapytania danej frazy.
+        """
+        if self.batch_mode:
+            return self.iter_phrases_batched(text, phrases, on_variant)
+        
+        return self.iter_phrase_contexts([(text, phrase) for phrase in phrases], on_variant)
+
+    def iter_phrase_contexts(self, items: List[Tuple[str, str]],
+                             on_variant: Optional[Callable[[str, Dict[str, str]], None]] = None
+                             ) -> Iterator[Tuple[bool, List[Dict[str, str]], Dict[str, int]]]:
+        """
+        Sprawdza pary (tekst, fraza) równolegle - każda fraza może mieć własny tekst
+        (np. tylko okna z kandydatami wyznaczone przez prefilter).
+        Wyniki check_phrase_with_gpt4mini zwracane są w kolejności par, po zakończeniu zapytania każdej z nich.
+        """
+        def check(item: Tuple[str, str]):
+            text, phrase = item
+            callback = (lambda variant: on_variant(phrase, variant)) if on_variant is not None else None
+            return self.check_phrase_with_gpt4mini(text, phrase, callback)
+        
+        return self._imap(check, items)
+
+    def _imap(self, func, items: List) -> Iterator:
+        """
+        Zleca wykonanie funkcji dla wszystkich elementów w puli wątków od razu
+        i zwraca wyniki w kolejności wejścia, gdy tylko kolejny jest gotowy.
+        """
+        if not items:
+            return iter([])
+        
+        # Także jedno zapytanie (lub max_workers=1) trafia do wątku - wysyłane jest od razu,
+        # a nie dopiero przy pobraniu pierwszego wyniku
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(items))))
+        futures = [executor.submit(func, item) for item in items]
+        
+        def results() -> Iterator:
+            try:
+                for future in futures:
+                    yield future.result()
+            finally:
+                # Przerwane pobieranie wyników - niewysłane zapytania są anulowane
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=False)
+        
+        return results()
+
+    def create_batch_prompt(self, text: str, phrases: List[str]) -> str:
+        phrase_list = "\n".join(f"{i}. {phrase}" for i, phrase in enumerate(phrases, 1))
+        return f"""ZADANIE: Znajdź w tekście WSZYSTKIE rzeczywiste wystąpienia każdej z podanych fraz.
+WAŻNE: Zwracaj TYLKO te fragmenty, które NAPRAWDĘ występują w tekście - NIE WYMYŚLAJ żadnych przykładów!
+
+FRAZY DO WYSZUKANIA:
+{phrase_list}
+
+TEKST DO PRZEANALIZOWANIA:
+{text}
+
+INSTRUKCJE:
+1. Dla każdej frazy znajdź WSZYSTKIE wystąpienia frazy lub jej wariantów
+2. Każdy znaleziony fragment MUSI być dokładnym cytatem z tekstu
+3. Dla każdego znalezionego fragmentu określ typ:
+   - dokładne (identyczne jak wzór)
+   - odmiana (inna forma gramatyczna)
+   - rozdzielone (przerwane znakami lub słowami)
+   - przestawione (zmieniona kolejność)
+   - rozszerzone (z dodatkowymi słowami)
+
+WYMAGANY FORMAT ODPOWIEDZI (wyłącznie JSON, bez komentarzy):
+{{"wyniki": [{{"id": 1, "fragmenty": [{{"fragment": "dokładny_cytat_z_tekstu", "typ": "dokładne"}}]}}]}}
+
+KRYTYCZNIE WAŻNE:
+- "id" to numer frazy z listy FRAZY DO WYSZUKANIA
+- Podaj wpis dla KAŻDEJ frazy, także gdy nic nie znalazłeś (pusta lista "fragmenty")
+- Każdy fragment musi być możliwy do znalezienia w tekście poprzez ctrl+f
+- NIE WYMYŚLAJ żadnych wariantów - raportuj tylko to co znalazłeś"""
+
+    def plan_batches(self, text: str, phrases: List[str]) -> List[List[str]]:
+        """
+        Dzieli frazy na paczki mieszczące się w oknie kontekstu modelu
+        razem z tekstem i miejscem na odpowiedź. Frazy, które nie zmieszczą się
+        nawet w osobnej paczce, są pomijane (nie są wysyłane).
+        """
+        context = self.context_window()
+        available = context - estimate_tokens(self.create_batch_prompt(text, []))
+        
+        batches = []
+        current: List[str] = []
+        used = 0
+        for phrase in phrases:
+            cost = estimate_tokens(phrase) + 4 + self.BATCH_OUTPUT_TOKENS_PER_PHRASE
+            if cost > available:
+                continue
+            if current and (used + cost > available or len(current) >= self.MAX_BATCH_SIZE):
+                batches.append(current)
+                current, used = [], 0
+            current.append(phrase)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def parse_batch_response(self, response_text: str, phrases: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Parsuje odpowiedź JSON trybu wsadowego i przypisuje fragmenty do fraz bazowych.
+        Frazy rozpoznawane są po numerze "id", a w razie jego braku po treści frazy.
+        """
+        start = response_text.find("{")
+        end = response_text.rfind("}")
+        if start == -1 or end == -1:
+            raise ValueError("Odpowiedź nie zawiera JSON")
+        data = json.loads(response_text[start:end + 1])
+        
+        by_text = {phrase.lower(): phrase for phrase in phrases}
+        results: Dict[str, List[Dict[str, str]]] = {phrase: [] for phrase in phrases}
+        for entry in data.get("wyniki", []):
+            phrase = None
+            try:
+                index = int(entry.get("id")) - 1
+                if 0 <= index < len(phrases):
+                    phrase = phrases[index]
+            except (TypeError, ValueError):
+                pass
+            if phrase is None:
+                phrase = by_text.get(str(entry.get("fraza", "")).strip().lower())
+            if phrase is None:
+                continue
+            
+            for item in entry.get("fragmenty", []):
+                fragment = str(item.get("fragment", "")).strip()
+                typ = str(item.get("typ", "")).strip().lower()
+                if fragment and typ in self.VARIANT_TYPES:
+                    results[phrase].append({"fragment": fragment, "typ": typ})
+        return results
+
+    def _count_types(self, variants: List[Dict[str, str]]) -> Dict[str, int]:
+        stats = {typ: 0 for typ in self.VARIANT_TYPES}
+        for variant in variants:
+            stats[variant["typ"]] += 1
+        stats["total"] = len(variants)
+        return stats
+
+    def _check_batch(self, text: str, batch: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        try:
+            return self.parse_batch_response(self._post_chat(self.create_batch_prompt(text, batch)), batch)
+        except Exception as e:
+            logger.exception("gpt_batch_check_failed", extra={"data": {"phrases": len(batch)}})
+            self._report_exception(e)
+            return {}
+
+    def iter_phrases_batched(self, text: str, phrases: List[str],
+                             on_variant: Optional[Callable[[str, Dict[str, str]], None]] = None
+                             ) -> Iterator[Tuple[bool, List[Dict[str, str]], Dict[str, int]]]:
+        """
+        Sprawdza frazy w trybie wsadowym - tekst wysyłany jest raz dla całej paczki fraz,
+        a wyniki każdej frazy zapisywane są w cache osobno. Paczki są wysyłane od razu,
+        a wyniki zwracane w kolejności fraz - frazy z cache natychmiast, pozostałe po
+        odpowiedzi ich paczki (wtedy też wywoływana jest on_variant).
+        """
+        results: Dict[str, Tuple[bool, List[Dict[str, str]], Dict[str, int]]] = {}
+        keys = {}
+        missing = []
+        for phrase in dict.fromkeys(phrases):
+            keys[phrase] = self.cache.make_key(text, phrase, self.MODEL, self.BATCH_PROMPT_VERSION, self.TEMPERATURE)
+            cached = self.cache.get(keys[phrase])
+            if cached is not None:
+                self.tracer.add("cache_hits")
+                results[phrase] = (True, cached["variants"], cached["stats"])
+                if on_variant is not None:
+                    for variant in cached["variants"]:
+                        on_variant(phrase, variant)
+            else:
+                self.tracer.add("cache_misses")
+                missing.append(phrase)
+        
+        batches: List[List[str]] = []
+        if missing and not self.api_key:
+            self._report_error("Wprowadź i zapisz klucz API w panelu konfiguracji!")
+        elif missing:
+            batches = self.plan_batches(text, missing)
+            if sum(len(batch) for batch in batches) < len(missing):
+                self._report_overflow()
+        
+        def check(batch: List[str]) -> Dict[str, List[Dict[str, str]]]:
+            batch_results = self._check_batch(text, batch)
+            if on_variant is not None:
+                for phrase, variants in batch_results.items():
+                    for variant in variants:
+                        on_variant(phrase, variant)
+            return batch_results
+        
+        # Numer paczki każdej brakującej frazy (paczki zachowują kolejność fraz)
+        batch_of = {phrase: number for number, batch in enumerate(batches) for phrase in batch}
+        checked = zip(batches, self._imap(check, batches))
+        
+        def ordered() -> Iterator[Tuple[bool, List[Dict[str, str]], Dict[str, int]]]:
+            received = 0
+            for phrase in phrases:
+                while batch_of.get(phrase, -1) >= received:
+                    batch, batch_results = next(checked)
+                    received += 1
+                    for batch_phrase in batch:
+                        if batch_phrase not in batch_results:
+                            continue
+                        variants = batch_results[batch_phrase]
+                        stats = self._count_types(variants)
+                        self.cache.set(keys[batch_phrase], {"variants": variants, "stats": stats})
+                        results[batch_phrase] = (True, variants, stats)
+                yield results.get(phrase, (False, [], {}))
+        
+        return ordered()
@@ -0,0 +1,60 @@
+"""
+Klient usługi analizy (analysis_service.py) używany przez aplikację Streamlit.
+
+Odrzucone żądania (503 - kolejka usługi jest pełna) ponawiane są po czasie
+z nagłówka Retry-After, najwyżej max_retries razy.
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+
+class ServiceError(Exception):
+    """Błąd usługi analizy"""
+
+
+class AnalysisClient:
+    """Klient HTTP usługi analizy (wspólna sesja - ponowne użycie połączeń)"""
+
+    def __init__(self, base_url: str, timeout: Optional[float] = None, max_retries: Optional[int] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout or float(os.getenv("SERVICE_CLIENT_TIMEOUT", "300"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("SERVICE_CLIENT_RETRIES", "5"))
+        self.session = requests.Session()
+
+    def analyze(self, documents: List[str], phrases: List[str], use_gpt: bool = False,
+                gpt_batch: bool = False, api_key: Optional[str] = None,
+                options: Optional[Dict] = None) -> List[Dict]:
+        """
+        Analizuje dokumenty w usłudze.
+
+        Returns:
+            List[Dict]: Dla każdego dokumentu warianty, statystyki, błędy GPT i pomiary czasu
+        """
+        payload = {
+            "documents": documents,
+            "phrases": phrases,
+            "use_gpt": use_gpt,
+            "gpt_batch": gpt_batch,
+            "api_key": api_key,
+            "options": options or {},
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(f"{self.base_url}/analyze", json=payload, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                raise ServiceError(f"❌ Brak połączenia z usługą analizy ({self.base_url}): {e}")
+            if response.status_code == 503:
+                if attempt == self.max_retries:
+                    raise ServiceError("❌ Usługa analizy jest przeciążona - spróbuj ponownie za chwilę.")
+                time.sleep(float(response.headers.get("Retry-After", "1")))
+                continue
+            if response.status_code != 200:
+                try:
+                    message = response.json().get("error", response.text)
+                except ValueError:
+                    message = response.text
+                raise ServiceError(f"❌ Błąd usługi analizy ({response.status_code}): {message}")
+            return response.json()["results"]
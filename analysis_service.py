@@ -0,0 +1,350 @@
+"""
+Lokalna usługa HTTP/JSON analizy tekstów.
+
+Model spaCy ładowany jest raz w każdym procesie roboczym. Żądania trafiają do
+ograniczonej kolejki, z której wątki rozdzielające pobierają mikro-paczki
+(do SERVICE_BATCH_SIZE żądań, czekając na kolejne najwyżej SERVICE_BATCH_WAIT s).
+Proces roboczy parsuje wszystkie dokumenty paczki jednym nlp.pipe.
+Gdy kolejka jest pełna, usługa od razu odpowiada 503 z nagłówkiem Retry-After
+(kontrola przyjęć) zamiast wydłużać czas oczekiwania wszystkich użytkowników.
+
+Użycie:
+    python analysis_service.py --port 8600 --workers 4
+    ANALYSIS_SERVICE_URL=http://127.0.0.1:8600 streamlit run app.py
+
+API:
+    POST /analyze  {"documents": [...], "phrases": [...], "use_gpt": false, "gpt_batch": false,
+                    "api_key": null, "options": {"max_gap": 3}}
+                   → {"results": [{"variants": [...], "stats": {...}, "errors": [...], "performance": {...}}]}
+    GET /health    → stan kolejki i liczniki usługi
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# Opcje iter_find_phrases, które klient może ustawić w żądaniu
+REQUEST_OPTIONS = ("gpt_prefilter", "context_sentences", "local_variants", "max_gap")
+# Liczba skompilowanych zestawów fraz trzymanych w procesie roboczym
+MATCHER_CACHE_SIZE = 16
+
+# Stan procesu roboczego (ustawiany raz w _init_worker)
+_worker: Dict = {}
+
+
+def _init_worker(workers: int = 1) -> None:
+    """Ładuje model raz na proces roboczy"""
+    from lemmatizer import load_spacy_model
+    from lemma_table import use_lemma_table
+    from doc_cache import open_doc_cache
+    from rate_limiter import rate_limiter_from_env
+    from tracing import setup_logging
+
+    # Zapytania API i podsumowania analiz trafiają do wspólnego logu JSON (LOG_PATH)
+    setup_logging()
+    _worker["nlp"] = use_lemma_table(load_spacy_model())
+    _worker["matchers"] = OrderedDict()
+    # Trwały cache dokumentów współdzielony przez procesy (SQLite w trybie WAL)
+    _worker["doc_cache"] = open_doc_cache(_worker["nlp"])
+    # Limity RPM/TPM dzielone między procesy robocze - razem nie przekraczają limitu konta
+    _worker["rate_limiter"] = rate_limiter_from_env(workers)
+
+
+def _get_matcher(phrases: List[str]):
+    """Skompilowany PhraseMatcher dla listy fraz (LRU - klienci zwykle wysyłają te same frazy)"""
+    from phrase_matcher import PhraseMatcher
+
+    matchers = _worker["matchers"]
+    key = tuple(phrases)
+    matcher = matchers.get(key)
+    if matcher is None:
+        matcher = PhraseMatcher(phrases, _worker["nlp"])
+        matchers[key] = matcher
+        if len(matchers) > MATCHER_CACHE_SIZE:
+            matchers.popitem(last=False)
+    else:
+        matchers.move_to_end(key)
+    return matcher
+
+
+def analyze_batch(requests: List[Dict]) -> List[Dict]:
+    """
+    Analizuje mikro-paczkę żądań w procesie roboczym.
+    Fragmenty wszystkich dokumentów paczki parsowane są razem, a wyniki zwracane w kolejności żądań.
+    """
+    from ai_checker import AIChecker
+    from chunking import split_into_chunks
+    from doc_cache import TieredDocCache
+    from lemmatizer import analysis_chunk_chars, find_phrases, iter_docs
+    from tracing import Tracer
+
+    nlp = _worker["nlp"]
+    overlap_chars = int(os.getenv("ANALYSIS_OVERLAP_CHARS", "1000"))
+
+    docs = TieredDocCache({}, _worker["doc_cache"]) if _worker["doc_cache"] is not None else {}
+    # Fragmenty jak w find_phrases (przy GPT krótsze - okno kontekstu modelu)
+    texts = []
+    for request in requests:
+        chunk_chars = analysis_chunk_chars(bool(request.get("use_gpt")))
+        for document in request["documents"]:
+            texts.extend(chunk for _, chunk in split_into_chunks(document, chunk_chars, overlap_chars))
+    parse_started = time.perf_counter()
+    for _ in iter_docs(nlp, texts, 1, docs):
+        pass
+    parse_seconds = time.perf_counter() - parse_started
+    total_chars = max(1, sum(map(len, texts)))
+
+    responses = []
+    for request in requests:
+        try:
+            phrases = request["phrases"]
+            use_gpt = bool(request.get("use_gpt"))
+            gpt_batch = bool(request.get("gpt_batch"))
+            options = {k: v for k, v in (request.get("options") or {}).items() if k in REQUEST_OPTIONS}
+            matcher = _get_matcher(phrases)
+            results = []
+            for document in request["documents"]:
+                tracer = Tracer("usługa")
+                # Czas wspólnego parsowania paczki dzielimy proporcjonalnie do długości dokumentów
+                tracer.add_time("spacy_parse", parse_seconds * len(document) / total_chars)
+                ai_checker = AIChecker(api_key=request.get("api_key"), batch_mode=gpt_batch, tracer=tracer,
+                                       rate_limiter=_worker["rate_limiter"]) if use_gpt else None
+                variants, stats = find_phrases(
+                    document, phrases, nlp, gpt_batch=gpt_batch, use_gpt=use_gpt, ai_checker=ai_checker,
+                    matcher=matcher, tracer=tracer, doc_cache=docs,
+                    overlap_chars=overlap_chars, **options
+                )
+                results.append({
+                    "variants": variants.to_records(),
+                    "stats": stats,
+                    "errors": list(ai_checker.errors) if ai_checker is not None else [],
+                    "performance": tracer.summary(),
+                })
+            responses.append({"results": results})
+        except Exception as e:
+            responses.append({"error": str(e)})
+    return responses
+
+
+class _Job:
+    """Żądanie oczekujące w kolejce na wynik"""
+
+    def __init__(self, request: Dict):
+        self.request = request
+        self.done = threading.Event()
+        self.response: Optional[Dict] = None
+
+
+class AnalysisService:
+    """Serwer HTTP z kolejką żądań, mikro-paczkami i pulą procesów z modelem"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8600, workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 batch_wait: Optional[float] = None, request_timeout: Optional[float] = None,
+                 max_chars: Optional[int] = None):
+        self.workers = workers or int(os.getenv("SERVICE_WORKERS", str(os.cpu_count() or 1)))
+        self.batch_size = batch_size or int(os.getenv("SERVICE_BATCH_SIZE", "8"))
+        self.batch_wait = batch_wait if batch_wait is not None else float(os.getenv("SERVICE_BATCH_WAIT", "0.01"))
+        self.request_timeout = request_timeout or float(os.getenv("SERVICE_REQUEST_TIMEOUT", "300"))
+        self.max_chars = max_chars or int(os.getenv("SERVICE_MAX_CHARS", "2000000"))
+        self.queue: "queue.Queue[_Job]" = queue.Queue(
+            maxsize=queue_size or int(os.getenv("SERVICE_QUEUE_SIZE", "64"))
+        )
+        self.stats = {"requests": 0, "rejected": 0, "batches": 0, "batched_requests": 0, "max_queue": 0}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.workers,))
+        # Jeden wątek rozdzielający na proces - każdy proces ma w danej chwili jedną paczkę
+        self._dispatchers = [
+            threading.Thread(target=self._dispatch, daemon=True) for _ in range(self.workers)
+        ]
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def retry_after(self) -> int:
+        """Szacowany czas (s), po którym warto ponowić odrzucone żądanie"""
+        return max(1, self.queue.qsize() // (self.workers * self.batch_size))
+
+    def submit(self, request: Dict) -> Optional[_Job]:
+        """Dodaje żądanie do kolejki; None, gdy kolejka jest pełna"""
+        job = _Job(request)
+        with self._lock:
+            self.stats["requests"] += 1
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.stats["rejected"] += 1
+            return None
+        with self._lock:
+            self.stats["max_queue"] = max(self.stats["max_queue"], self.queue.qsize())
+        return job
+
+    def _next_batch(self) -> List[_Job]:
+        """Pobiera mikro-paczkę: pierwsze żądanie i te, które nadejdą w ciągu batch_wait"""
+        try:
+            batch = [self.queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            with self._lock:
+                self.stats["batches"] += 1
+                self.stats["batched_requests"] += len(batch)
+            try:
+                responses = self.pool.submit(analyze_batch, [job.request for job in batch]).result()
+            except Exception as e:
+                responses = [{"error": f"Błąd procesu roboczego: {e}"}] * len(batch)
+            for job, response in zip(batch, responses):
+                job.response = response
+                job.done.set()
+
+    def health(self) -> Dict:
+        with self._lock:
+            return {"status": "ok", "queue": self.queue.qsize(), "queue_size": self.queue.maxsize,
+                    "workers": self.workers, **self.stats}
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send_json(200, service.health())
+                else:
+                    self._send_json(404, {"error": "Nie znaleziono"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                # Limit w bajtach - znak UTF-8 ma najwyżej 4 bajty
+                if length > service.max_chars * 4:
+                    self.close_connection = True
+                    self._send_json(413, {"error": "Żądanie jest zbyt duże"})
+                    return
+                body = self.rfile.read(length)
+                if self.path != "/analyze":
+                    self._send_json(404, {"error": "Nie znaleziono"})
+                    return
+                try:
+                    request = json.loads(body or b"{}")
+                    documents, phrases = request["documents"], request["phrases"]
+                    if not (isinstance(documents, list) and isinstance(phrases, list)
+                            and all(isinstance(item, str) for item in documents + phrases)):
+                        raise ValueError
+                except (ValueError, KeyError, TypeError):
+                    self._send_json(400, {"error": "Oczekiwano pól documents i phrases (listy tekstów)"})
+                    return
+                if sum(map(len, documents)) > service.max_chars:
+                    self._send_json(413, {"error": "Żądanie jest zbyt duże"})
+                    return
+
+                job = service.submit(request)
+                if job is None:
+                    # Przeciążenie - klient ponawia po Retry-After
+                    self._send_json(503, {"error": "Usługa analizy jest przeciążona"},
+                                    {"Retry-After": str(service.retry_after())})
+                    return
+                if not job.done.wait(service.request_timeout):
+                    self._send_json(504, {"error": "Przekroczono czas analizy"})
+                    return
+                if "error" in job.response:
+                    self._send_json(500, {"error": job.response["error"]})
+                else:
+                    self._send_json(200, job.response)
+
+        return Handler
+
+    def start(self) -> "AnalysisService":
+        for dispatcher in self._dispatchers:
+            dispatcher.start()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._stopping.set()
+        for dispatcher in self._dispatchers:
+            dispatcher.join()
+        self.pool.shutdown()
+
+    def __enter__(self) -> "AnalysisService":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalna usługa analizy tekstów (HTTP/JSON)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, help="Liczba procesów z modelem (SERVICE_WORKERS)")
+    parser.add_argument("--queue-size", type=int, help="Pojemność kolejki żądań (SERVICE_QUEUE_SIZE)")
+    parser.add_argument("--batch-size", type=int, help="Maksymalna liczba żądań w paczce (SERVICE_BATCH_SIZE)")
+    parser.add_argument("--batch-wait", type=float, help="Czas zbierania paczki w sekundach (SERVICE_BATCH_WAIT)")
+    args = parser.parse_args()
+
+    from tracing import setup_logging
+    setup_logging()
+    service = AnalysisService(args.host, args.port, args.workers, args.queue_size, args.batch_size, args.batch_wait)
+    print(f"Usługa analizy działa: {service.base_url}")
+    try:
+        service.start()
+        service._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
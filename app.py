@@ -1,14 +1,18 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
 import os
-import time
+import tempfile
 import json
-import requests
+import time
 from datetime import datetime
-import re
 
-from lemmatizer import load_model, find_phrases, highlight_text, generate_statistics
+from lemmatizer import load_model, get_doc_cache, highlight_text, text_key
+from incremental import IncrementalAnalysis
+from match_results import MatchResults
+from analysis_client import AnalysisClient, ServiceError
+from ai_checker import get_gpt_cache
+from history_store import HistoryStore
+import history_analytics
+from tracing import Tracer, setup_logging
 
 # Konfiguracja strony
 st.set_page_config(
@@ -45,29 +49,252 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Inicjalizacja modelu
-nlp = load_model()
+# Strukturalny log JSON
+setup_logging()
+
+# Usługa analizy (analysis_service.py) - aplikacja jest wtedy tylko klientem i nie ładuje modelu
+SERVICE_URL = os.getenv("ANALYSIS_SERVICE_URL")
+
+@st.cache_resource
+def get_analysis_client() -> AnalysisClient:
+    return AnalysisClient(SERVICE_URL)
+
+# Inicjalizacja modelu (raz na proces, wraz z rozgrzewką)
+nlp = None
+if not SERVICE_URL:
+    try:
+        nlp = load_model()
+    except OSError as e:
+        st.error(str(e))
+        st.stop()
+
+@st.cache_resource
+def get_history_store() -> HistoryStore:
+    """Zwraca współdzieloną historię analiz (przy pierwszym uruchomieniu migruje history.csv)"""
+    return HistoryStore(os.getenv("HISTORY_DB_PATH", "history.sqlite"), legacy_csv="history.csv")
+
+@st.cache_data(show_spinner=False)
+def count_history(date_filter, phrase_filter: str, history_version: int) -> int:
+    """Liczba rekordów dla filtrów (history_version unieważnia cache po nowym zapisie)"""
+    return get_history_store().count(date_filter, phrase_filter)
 
-def save_to_history(text: str, phrases: list, all_variants: list, stats: dict):
-    """Zapisuje wyniki do historii"""
-    history_file = "history.csv"
+@st.cache_data(show_spinner=False)
+def query_history(date_filter, phrase_filter: str, limit: int, offset: int, history_version: int) -> list:
+    """Strona rekordów dla filtrów (history_version unieważnia cache po nowym zapisie)"""
+    return get_history_store().query(date_filter, phrase_filter, limit=limit, offset=offset)
+
+# Okresy zestawień analityki (częstotliwości pandas)
+ANALYTICS_PERIODS = {"Dzień": "D", "Tydzień": "W", "Miesiąc": "M"}
+
+@st.cache_data(show_spinner=False)
+def history_analytics_view(since, freq: str, history_version: int) -> dict:
+    """Zestawienia analityki historii (history_version unieważnia cache po nowym zapisie)"""
+    return history_analytics.compute(get_history_store(), since, freq)
+
+def save_to_history(text: str, phrases: list, all_variants: MatchResults, stats: dict, performance: dict = None):
+    """Zapisuje wyniki do historii (wraz z pomiarami wydajności analizy)"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     new_record = {
         "timestamp": timestamp,
         "tekst_oryginalny": text[:100] + "..." if len(text) > 100 else text,
         "frazy_kluczowe": ", ".join(phrases),
-        "wyniki": json.dumps(all_variants, ensure_ascii=False),
-        "statystyki": json.dumps(stats, ensure_ascii=False)
+        "wyniki": json.dumps(all_variants.to_records(), ensure_ascii=False),
+        "statystyki": json.dumps(stats, ensure_ascii=False),
+        "wydajnosc": json.dumps(performance, ensure_ascii=False) if performance else None
     }
     
-    if os.path.exists(history_file):
-        df = pd.read_csv(history_file)
-        df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
-    else:
-        df = pd.DataFrame([new_record])
+    get_history_store().append(new_record, phrases, all_variants.rows(), stats)
+
+STAGE_LABELS = {
+    "phrase_compile": "Kompilacja fraz",
+    "spacy_parse": "Parsowanie spaCy",
+    "matching": "Dopasowanie fraz",
+    "gpt": "GPT (czas całkowity)",
+    "gpt_request": "Zapytania GPT (suma)",
+    "merge": "Łączenie wyników",
+    "service": "Usługa analizy (czas odpowiedzi)",
+    "render_table": "Tabela wyników",
+    "highlight": "Podświetlanie tekstu",
+    "render_charts": "Wykresy statystyk",
+    "save_to_history": "Zapis do historii",
+}
+
+def render_performance(summary: dict):
+    """Wyświetla panel z czasami etapów analizy i licznikami zapytań"""
+    import pandas as pd
+    
+    with st.expander("Wydajność"):
+        counters = summary["counters"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Czas całkowity", f"{summary['total_seconds']:.2f} s")
+        col2.metric("Zapytania API", counters.get("api_calls", 0))
+        col3.metric("Tokeny (we/wy)", f"{counters.get('tokens_in', 0)} / {counters.get('tokens_out', 0)}")
+        col4.metric("Cache GPT (trafienia)", f"{counters.get('cache_hits', 0)} / {counters.get('cache_hits', 0) + counters.get('cache_misses', 0)}")
+        st.caption(
+            f"Ponowienia zapytań: {counters.get('retries', 0)}, błędy: {counters.get('errors', 0)}, "
+            f"frazy pominięte przez filtr: {counters.get('gpt_skipped_phrases', 0)}, "
+            f"znaki wysłane do GPT: {counters.get('gpt_context_chars', 0)}, "
+            f"odrzucone fragmenty GPT (brak w tekście): {counters.get('gpt_rejected_fragments', 0)}, "
+            f"akapity przeanalizowane / z poprzedniej analizy: "
+            f"{counters.get('paragraphs_analyzed', 0)} / {counters.get('paragraphs_reused', 0)}"
+        )
+        
+        stages_df = pd.DataFrame([
+            {
+                "Etap": STAGE_LABELS.get(name, name),
+                "Wywołania": stage["calls"],
+                "Czas [s]": stage["seconds"]
+            }
+            for name, stage in summary["stages"].items()
+        ])
+        st.dataframe(stages_df, use_container_width=True, hide_index=True)
+
+def variants_dataframe(all_variants: MatchResults):
+    """Tworzy tabelę wariantów do wyświetlenia"""
+    # Tabela budowana z kolumn wyników (fraza, typ i źródło jako kategorie)
+    df_variants = all_variants.to_dataframe()[["fraza_bazowa", "znaleziony_fragment", "typ", "źródło"]]
+    df_variants = df_variants.rename(columns={
+        "fraza_bazowa": "Fraza bazowa",
+        "znaleziony_fragment": "Znaleziony wariant",
+        "typ": "Typ dopasowania",
+        "źródło": "Źródło"
+    })
+    
+    # Sortujemy alfabetycznie według frazy bazowej i typu (kategorie sortowane są po kodach)
+    for column in ["Fraza bazowa", "Typ dopasowania"]:
+        df_variants[column] = df_variants[column].cat.reorder_categories(sorted(df_variants[column].cat.categories))
+    return df_variants.sort_values(["Fraza bazowa", "Typ dopasowania"])
+
+# Minimalny odstęp pomiędzy kolejnymi odświeżeniami wyników w trakcie analizy (s)
+RENDER_INTERVAL = float(os.getenv("RENDER_INTERVAL", "0.25"))
+
+def analysis_key(text: str, phrases: list, use_gpt: bool, gpt_batch: bool) -> str:
+    """Skrót danych wejściowych analizy - wyniki w sesji dotyczą tylko tych samych danych"""
+    return text_key(json.dumps([text, phrases, use_gpt, gpt_batch], ensure_ascii=False))
+
+def render_statistics(stats: dict):
+    """Wykres typów dopasowań i szczegółowe statystyki"""
+    import plotly.graph_objects as go
+    
+    # Tworzymy 2 kolumny na statystyki
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Wykres kołowy typów dopasowań
+        types_data = {
+            "dokładne": stats["dokładne"],
+            "odmiana": stats["odmiana"],
+            "rozdzielone": stats["rozdzielone"],
+            "przestawione": stats["przestawione"],
+            "rozszerzone": stats["rozszerzone"],
+            "lematyzacja": stats["lematyzacja"]
+        }
+        
+        fig = go.Figure(data=[go.Pie(
+            labels=list(types_data.keys()),
+            values=list(types_data.values()),
+            hole=.3
+        )])
+        fig.update_layout(title="Typy dopasowań")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        # Szczegółowe statystyki w formie tabeli
+        st.markdown(
+            f"""<div class="stats-box">
+            <h3>Szczegółowe statystyki</h3>
+            <p>Łącznie znalezionych wariantów: {stats["total"]}</p>
+            <p>W tym:</p>
+            <ul>
+                <li>Dokładne dopasowania: {stats["dokładne"]}</li>
+                <li>Odmiany: {stats["odmiana"]}</li>
+                <li>Rozdzielone: {stats["rozdzielone"]}</li>
+                <li>Przestawione: {stats["przestawione"]}</li>
+                <li>Rozszerzone: {stats["rozszerzone"]}</li>
+                <li>Przez lematyzację: {stats["lematyzacja"]}</li>
+            </ul>
+            </div>""",
+            unsafe_allow_html=True
+        )
+
+def results_layout() -> dict:
+    """Tworzy sekcje wyników i zwraca miejsca na tabelę, podświetlony tekst i statystyki"""
+    st.subheader("Znalezione warianty fraz")
+    progress = st.empty()
+    table = st.empty()
+    
+    st.subheader("Tekst z podświetlonymi frazami")
+    st.markdown("""
+        <div class="legend-container">
+            <span class="legend" style="background-color: #FFE4B5">Znalezione warianty</span>
+        </div>
+    """, unsafe_allow_html=True)
+    highlight = st.empty()
+    
+    st.subheader("Statystyki")
+    statistics = st.empty()
+    return {"progress": progress, "table": table, "highlight": highlight, "statistics": statistics}
+
+def render_results(placeholders: dict, text: str, all_variants: MatchResults, stats: dict, tracer: Tracer = None):
+    """Wyświetla (lub odświeża) tabelę wariantów, podświetlony tekst i statystyki"""
+    tracer = tracer if tracer is not None else Tracer()
+    with tracer.stage("render_table"):
+        placeholders["table"].dataframe(variants_dataframe(all_variants), use_container_width=True)
+    with tracer.stage("highlight"):
+        placeholders["highlight"].markdown(highlight_text(text, all_variants), unsafe_allow_html=True)
+    with tracer.stage("render_charts"):
+        with placeholders["statistics"].container():
+            render_statistics(stats)
+
+def run_analysis(text: str, phrases: list, use_gpt: bool, gpt_batch: bool, placeholders: dict) -> dict:
+    """
+    Analizuje tekst, wyświetlając wyniki w miarę ich napływania (po SpaCy i po każdej frazie
+    sprawdzonej przez GPT, nie częściej niż co RENDER_INTERVAL sekund), i zapisuje je do historii.
     
-    df.to_csv(history_file, index=False)
+    Returns:
+        dict: Wyniki analizy (variants, stats, performance) do zapamiętania w sesji
+    """
+    # Analiza przyrostowa - ponownie analizowane są tylko zmienione akapity
+    if 'incremental' not in st.session_state:
+        st.session_state['incremental'] = IncrementalAnalysis(
+            get_analysis_client() if SERVICE_URL else None,
+            None if SERVICE_URL else get_doc_cache()
+        )
+    tracer = Tracer("analiza")
+    all_variants = MatchResults(text, phrases)
+    stats = {}
+    progress = placeholders["progress"].progress(0.0, text="Analiza fragmentów tekstu...")
+    rendered_at = None
+    pending = True
+    try:
+        for result in st.session_state['incremental'].run(text, phrases, nlp, gpt_batch=gpt_batch,
+                                                          use_gpt=use_gpt, tracer=tracer,
+                                                          api_key=st.session_state['openai_api_key']):
+            all_variants.extend(result.variants)
+            stats = result.stats
+            pending = pending or len(result.variants) > 0
+            progress.progress(
+                result.progress,
+                text=f"Przeanalizowano fragment {result.index + 1} z {result.total}" if result.done == 1.0
+                else f"Analiza fragmentu {result.index + 1} z {result.total} ({result.done:.0%})"
+            )
+            # Pierwsze wyniki od razu, kolejne odświeżenia co najmniej co RENDER_INTERVAL
+            if pending and (rendered_at is None or time.perf_counter() - rendered_at >= RENDER_INTERVAL):
+                render_results(placeholders, text, all_variants, stats, tracer)
+                rendered_at = time.perf_counter()
+                pending = False
+    except ServiceError as e:
+        st.error(str(e))
+        st.stop()
+    if pending:
+        render_results(placeholders, text, all_variants, stats, tracer)
+    
+    # Zapisanie do historii
+    with tracer.stage("save_to_history"):
+        save_to_history(text, phrases, all_variants, stats, tracer.summary())
+    performance = tracer.log_summary()
+    return {"variants": all_variants, "stats": stats, "performance": performance}
 
 def main():
     st.title("Lematyzator tekstów z historią")
@@ -100,15 +327,41 @@ def main():
         if st.session_state['openai_api_key']:
             st.success("Klucz API jest skonfigurowany")
         else:
-            st.warning("Wprowadź klucz API aby korzystać z analizy tekstu")
+            st.warning("Wprowadź klucz API aby korzystać z drugiej opinii GPT")
+        
+        # Warianty rozdzielone/przestawione/rozszerzone wyszukiwane są lokalnie - GPT jest opcjonalny
+        use_gpt = st.checkbox(
+            "Druga opinia GPT",
+            value=False,
+            help="Dodatkowo sprawdza frazy przez GPT (wymaga klucza API, wolniejsze i płatne)"
+        )
+        
+        # Tryb wsadowy - wiele fraz w jednym zapytaniu do GPT
+        gpt_batch = st.checkbox(
+            "Tryb wsadowy GPT",
+            value=True,
+            disabled=not use_gpt,
+            help="Wysyła tekst raz dla wielu fraz naraz - mniej tokenów i krótszy czas analizy"
+        )
+        
+        # Statystyki cache odpowiedzi GPT
+        st.subheader("Cache GPT")
+        cache_stats = get_gpt_cache().stats()
+        col_hits, col_misses = st.columns(2)
+        col_hits.metric("Trafienia", cache_stats["hits"])
+        col_misses.metric("Chybienia", cache_stats["misses"])
+        st.caption(f"Zapisanych odpowiedzi: {cache_stats['entries']} ({cache_stats['bytes'] / 1024:.1f} KB)")
+        if st.button("Wyczyść cache GPT"):
+            get_gpt_cache().clear()
+            st.success("Cache GPT został wyczyszczony!")
     
     # Główne zakładki aplikacji
     tab1, tab2 = st.tabs(["Analiza tekstu", "Historia"])
     
     with tab1:
-        # Sprawdź czy klucz API jest skonfigurowany
-        if not st.session_state['openai_api_key']:
-            st.error("Wprowadź klucz API w panelu konfiguracji aby rozpocząć analizę!")
+        # Klucz API jest potrzebny tylko dla drugiej opinii GPT
+        if use_gpt and not st.session_state['openai_api_key']:
+            st.error("Wprowadź klucz API w panelu konfiguracji lub wyłącz drugą opinię GPT!")
             return
             
         col1, col2 = st.columns([2, 1])
@@ -145,100 +398,32 @@ def main():
 
         phrases = [p.strip() for p in phrases_input.split("\n") if p.strip()]
         
-        if st.button("Analizuj", type="primary", use_container_width=True):
-            if text_input and phrases:
-                with st.spinner("Trwa analiza..."):
-                    # Krok 1: Analiza tekstu i znalezienie wszystkich wariantów
-                    all_variants, stats = find_phrases(text_input, phrases, nlp)
-                    
-                    # Zapisanie do historii
-                    save_to_history(text_input, phrases, all_variants, stats)
-                    
-                    st.success("Analiza zakończona!")
-                    
-                    # Krok 2: Wyświetlanie tabeli z wariantami
-                    st.subheader("Znalezione warianty fraz")
-                    
-                    # Tworzymy DataFrame ze wszystkimi wariantami
-                    df_variants = pd.DataFrame(all_variants)
-                    df_variants = df_variants.rename(columns={
-                        "fraza_bazowa": "Fraza bazowa",
-                        "znaleziony_fragment": "Znaleziony wariant",
-                        "typ": "Typ dopasowania",
-                        "źródło": "Źródło"
-                    })
-                    
-                    # Sortujemy według frazy bazowej i typu
-                    df_variants = df_variants.sort_values(["Fraza bazowa", "Typ dopasowania"])
-                    
-                    # Wyświetlamy tabelę
-                    st.dataframe(df_variants, use_container_width=True)
-                    
-                    # Czekamy 5 sekund
-                    with st.spinner("Przygotowywanie kolorowania..."):
-                        time.sleep(5)
-                    
-                    # Krok 3: Kolorowanie wszystkich znalezionych wariantów
-                    st.subheader("Tekst z podświetlonymi frazami")
-                    st.markdown("""
-                        <div class="legend-container">
-                            <span class="legend" style="background-color: #FFE4B5">Znalezione warianty</span>
-                        </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Kolorujemy wszystkie znalezione warianty
-                    highlighted_text = highlight_text(text_input, all_variants)
-                    st.markdown(highlighted_text, unsafe_allow_html=True)
-                    
-                    # Statystyki
-                    st.subheader("Statystyki")
-                    
-                    # Tworzymy 2 kolumny na statystyki
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        # Wykres kołowy typów dopasowań
-                        types_data = {
-                            "dokładne": stats["dokładne"],
-                            "odmiana": stats["odmiana"],
-                            "rozdzielone": stats["rozdzielone"],
-                            "przestawione": stats["przestawione"],
-                            "rozszerzone": stats["rozszerzone"],
-                            "lematyzacja": stats["lematyzacja"]
-                        }
-                        
-                        fig = go.Figure(data=[go.Pie(
-                            labels=list(types_data.keys()),
-                            values=list(types_data.values()),
-                            hole=.3
-                        )])
-                        fig.update_layout(title="Typy dopasowań")
-                        st.plotly_chart(fig, use_container_width=True)
-                    
-                    with col2:
-                        # Szczegółowe statystyki w formie tabeli
-                        st.markdown(
-                            f"""<div class="stats-box">
-                            <h3>Szczegółowe statystyki</h3>
-                            <p>Łącznie znalezionych wariantów: {stats["total"]}</p>
-                            <p>W tym:</p>
-                            <ul>
-                                <li>Dokładne dopasowania: {stats["dokładne"]}</li>
-                                <li>Odmiany: {stats["odmiana"]}</li>
-                                <li>Rozdzielone: {stats["rozdzielone"]}</li>
-                                <li>Przestawione: {stats["przestawione"]}</li>
-                                <li>Rozszerzone: {stats["rozszerzone"]}</li>
-                                <li>Przez lematyzację: {stats["lematyzacja"]}</li>
-                            </ul>
-                            </div>""",
-                            unsafe_allow_html=True
-                        )
+        # Wyniki są przechowywane w sesji - interakcja z innymi widżetami nie uruchamia analizy ponownie
+        input_key = analysis_key(text_input, phrases, use_gpt, gpt_batch)
+        analysis = st.session_state.get('analysis')
+        if analysis is not None and analysis["key"] != input_key:
+            analysis = None
+        
+        analyze = st.button("Analizuj", type="primary", use_container_width=True)
+        if analyze and text_input and phrases and analysis is None:
+            with st.spinner("Trwa analiza..."):
+                results = run_analysis(text_input, phrases, use_gpt, gpt_batch, results_layout())
+            st.session_state['analysis'] = {"key": input_key, **results}
+            st.success("Analiza zakończona!")
+            # Czasy etapów i liczniki zapytań
+            render_performance(results["performance"])
+        elif analysis is not None:
+            # Wyniki z sesji (te same dane wejściowe) - wyświetlane bez ponownej analizy
+            render_results(results_layout(), text_input, analysis["variants"], analysis["stats"])
+            render_performance(analysis["performance"])
 
     with tab2:
+        import pandas as pd
+        
         st.subheader("Historia analiz")
-        if os.path.exists("history.csv"):
-            history_df = pd.read_csv("history.csv")
-            
+        history_store = get_history_store()
+        history_version = history_store.version()
+        if history_version:
             # Filtry
             col1, col2 = st.columns(2)
             with col1:
@@ -249,40 +434,81 @@ def main():
             with col2:
                 phrase_filter = st.text_input(
                     "Filtruj po frazie",
-                    placeholder="Wpisz frazę..."
+                    placeholder="Wpisz frazę lub jej fragment..."
                 )
             
-            # Aplikowanie filtrów
-            if date_filter:
-                history_df['date'] = pd.to_datetime(history_df['timestamp']).dt.date
-                history_df = history_df[history_df['date'] == date_filter]
-            
-            if phrase_filter:
-                history_df = history_df[
-                    history_df['frazy_kluczowe'].str.contains(
-                        phrase_filter,
-                        case=False,
-                        na=False
-                    )
-                ]
+            # Filtry wykonywane są w bazie, liczba wyników i strony są cache'owane do kolejnego zapisu
+            total = count_history(date_filter, phrase_filter, history_version)
             
             # Wyświetlanie historii
-            if not history_df.empty:
+            if total:
+                col1, col2 = st.columns(2)
+                with col1:
+                    page_size = st.selectbox("Wierszy na stronę", [25, 50, 100, 250], index=1)
+                pages = (total - 1) // page_size + 1
+                with col2:
+                    page = st.number_input(f"Strona (z {pages})", min_value=1, max_value=pages, value=1, step=1)
+                
+                history_df = pd.DataFrame(query_history(
+                    date_filter,
+                    phrase_filter,
+                    page_size,
+                    (page - 1) * page_size,
+                    history_version
+                ))
                 st.dataframe(
-                    history_df.sort_values("timestamp", ascending=False),
+                    history_df,
                     use_container_width=True,
                     hide_index=True
                 )
+                st.caption(f"Znalezionych analiz: {total}")
                 
-                # Eksport historii
-                st.download_button(
-                    "Pobierz całą historię (CSV)",
-                    history_df.to_csv(index=False).encode('utf-8'),
-                    "historia_analiz.csv",
-                    "text/csv"
-                )
+                # Eksport historii dopiero na żądanie - CSV zapisywany jest partiami z kursora do pliku
+                # tymczasowego (bez DataFrame całej historii), ale st.download_button przechowuje
+                # gotowy plik w pamięci serwera, bo Streamlit nie pozwala pobierać go strumieniowo
+                if st.button("Przygotuj eksport historii (CSV)"):
+                    with tempfile.TemporaryFile(mode="w+", newline="", encoding="utf-8") as export_file:
+                        history_store.write_csv(export_file, date_filter, phrase_filter)
+                        export_file.seek(0)
+                        st.download_button(
+                            "Pobierz całą historię (CSV)",
+                            export_file,
+                            "historia_analiz.csv",
+                            "text/csv"
+                        )
             else:
                 st.info("Brak wyników dla wybranych filtrów")
+
+            # Analityka - agregaty liczone na tabelach znormalizowanych
+            st.subheader("Analityka")
+            col1, col2 = st.columns(2)
+            with col1:
+                since = st.date_input("Analizy od dnia", value=None, key="analytics_since")
+            with col2:
+                period = st.selectbox("Okres", list(ANALYTICS_PERIODS), key="analytics_period")
+            analytics = history_analytics_view(since, ANALYTICS_PERIODS[period], history_version)
+            if analytics["phrases"].empty and analytics["analyses"].empty:
+                st.info("Brak analiz w wybranym okresie")
+            else:
+                st.write("Najczęściej znajdowane frazy")
+                st.dataframe(
+                    analytics["phrases"].head(50),
+                    use_container_width=True,
+                    column_config={
+                        "skuteczność": st.column_config.ProgressColumn(
+                            "skuteczność", format="%.2f", min_value=0.0, max_value=1.0
+                        )
+                    }
+                )
+                st.write("Typy dopasowań w czasie")
+                st.line_chart(analytics["types"])
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write("Liczba analiz")
+                    st.bar_chart(analytics["analyses"])
+                with col2:
+                    st.write("Dopasowania według źródła")
+                    st.bar_chart(analytics["sources"])
         else:
             st.info("Historia jest pusta")
 
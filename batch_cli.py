@@ -0,0 +1,196 @@
+"""
+Wsadowa analiza wielu dokumentów bez Streamlit.
+
+Każdy proces roboczy ładuje model spaCy i kompiluje frazy tylko raz,
+a wyniki zapisywane są strumieniowo (JSONL lub CSV) zaraz po przeanalizowaniu dokumentu.
+Przerwane uruchomienie można wznowić opcją --resume.
+
+Użycie:
+    python batch_cli.py artykuly/ --phrases frazy.txt --output wyniki.jsonl
+    python batch_cli.py "artykuly/**/*.txt" --phrases frazy.txt --output wyniki.csv --workers 8 --resume
+"""
+import os
+import sys
+import csv
+import glob
+import json
+import argparse
+import multiprocessing
+from typing import Dict, Iterable, List, Optional, Set
+
+CSV_COLUMNS = ["plik", "fraza_bazowa", "znaleziony_fragment", "typ", "źródło", "start", "end"]
+
+# Stan procesu roboczego (ustawiany raz w _init_worker)
+_worker: Dict = {}
+
+
+def collect_files(inputs: Iterable[str]) -> List[str]:
+    """Zbiera pliki .txt z katalogów (rekurencyjnie) i wzorców glob"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item, "**", "*.txt"), recursive=True))
+        else:
+            files.extend(glob.glob(item, recursive=True))
+    return sorted(dict.fromkeys(os.path.abspath(f) for f in files if os.path.isfile(f)))
+
+
+def read_phrases(path: str) -> List[str]:
+    """Wczytuje frazy (jedna fraza na linię)"""
+    with open(path, encoding="utf-8") as f:
+        return [p.strip() for p in f if p.strip()]
+
+
+def _init_worker(phrases: List[str], use_gpt: bool, gpt_batch: bool, workers: int = 1) -> None:
+    """Ładuje model i kompiluje frazy raz na proces roboczy"""
+    from lemmatizer import load_spacy_model
+    from phrase_matcher import PhraseMatcher
+    from lemma_table import use_lemma_table
+    from doc_cache import open_doc_cache
+    from tracing import setup_logging
+
+    # Zapytania API i podsumowania analiz trafiają do wspólnego logu JSON (LOG_PATH)
+    setup_logging()
+    # Tablica lematów (LEMMA_TABLE_PATH) jest mapowana w pamięci - procesy współdzielą jej strony
+    nlp = use_lemma_table(load_spacy_model())
+    _worker["nlp"] = nlp
+    # Dokumenty sprawdzane ponownie (np. z inną listą fraz) nie są parsowane od nowa
+    _worker["doc_cache"] = open_doc_cache(nlp)
+    _worker["phrases"] = phrases
+    _worker["matcher"] = PhraseMatcher(phrases, nlp)
+    _worker["use_gpt"] = use_gpt
+    _worker["ai_checker"] = None
+    if use_gpt:
+        from ai_checker import AIChecker
+        from rate_limiter import rate_limiter_from_env
+        # Limity RPM/TPM dzielone między procesy robocze - razem nie przekraczają limitu konta
+        _worker["ai_checker"] = AIChecker(api_key=os.getenv("OPENAI_API_KEY"), batch_mode=gpt_batch,
+                                          rate_limiter=rate_limiter_from_env(workers))
+
+
+def analyze_file(path: str) -> Dict:
+    """Analizuje jeden dokument w procesie roboczym"""
+    from lemmatizer import find_phrases
+
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        ai_checker = _worker["ai_checker"]
+        # Licznik błędów (lista komunikatów nie powtarza tych samych błędów)
+        errors_before = ai_checker.tracer.counters.get("errors", 0) if ai_checker is not None else 0
+        variants, stats = find_phrases(
+            text,
+            _worker["phrases"],
+            _worker["nlp"],
+            use_gpt=_worker["use_gpt"],
+            ai_checker=_worker["ai_checker"],
+            matcher=_worker["matcher"],
+            doc_cache=_worker["doc_cache"]
+        )
+        if ai_checker is not None and ai_checker.tracer.counters.get("errors", 0) > errors_before:
+            # Wyniki bez GPT nie trafiają do .done - dokument zostanie ponowiony przy --resume
+            return {"plik": path, "błąd": ai_checker.errors[-1] if ai_checker.errors else "Błąd zapytania do GPT"}
+        return {"plik": path, "wyniki": variants.to_records(), "statystyki": stats}
+    except Exception as e:
+        return {"plik": path, "błąd": str(e)}
+
+
+def read_done(progress_path: str) -> Set[str]:
+    """Zwraca pliki przetworzone w poprzednim uruchomieniu"""
+    if not os.path.exists(progress_path):
+        return set()
+    with open(progress_path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+class ResultWriter:
+    """Zapisuje wyniki strumieniowo do JSONL lub CSV"""
+
+    def __init__(self, path: str, fmt: str, append: bool):
+        self.fmt = fmt
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self.writer = None
+        if fmt == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=CSV_COLUMNS)
+            if not exists:
+                self.writer.writeheader()
+
+    def write(self, result: Dict) -> None:
+        if self.fmt == "jsonl":
+            self.file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        else:
+            for variant in result.get("wyniki", []):
+                self.writer.writerow({"plik": result["plik"], **{k: variant.get(k) for k in CSV_COLUMNS[1:]}})
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def run(files: List[str], phrases: List[str], output: str, fmt: str, workers: int,
+        resume: bool, use_gpt: bool = False, gpt_batch: bool = True) -> Dict[str, int]:
+    """
+    Analizuje dokumenty w puli procesów i zapisuje wyniki.
+
+    Returns:
+        Dict[str, int]: Liczba przetworzonych, pominiętych i błędnych dokumentów
+    """
+    progress_path = output + ".done"
+    done = read_done(progress_path) if resume else set()
+    todo = [f for f in files if f not in done]
+    summary = {"przetworzone": 0, "pominięte": len(files) - len(todo), "błędy": 0}
+
+    writer = ResultWriter(output, fmt, append=resume)
+    progress = open(progress_path, "a" if resume else "w", encoding="utf-8")
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(phrases, use_gpt, gpt_batch, workers)) as pool:
+            for result in pool.imap_unordered(analyze_file, todo, chunksize=4):
+                if "błąd" in result:
+                    # Plik nie trafia do listy przetworzonych - zostanie ponowiony przy --resume
+                    summary["błędy"] += 1
+                    print(f"Błąd: {result['plik']}: {result['błąd']}", file=sys.stderr)
+                    continue
+                writer.write(result)
+                progress.write(result["plik"] + "\n")
+                progress.flush()
+                summary["przetworzone"] += 1
+    finally:
+        writer.close()
+        progress.close()
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Wsadowa analiza dokumentów (lematyzator bez Streamlit)")
+    parser.add_argument("inputs", nargs="+", help="Katalogi lub wzorce glob z plikami .txt")
+    parser.add_argument("--phrases", required=True, help="Plik z frazami (jedna fraza na linię)")
+    parser.add_argument("--output", required=True, help="Plik wynikowy (.jsonl lub .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Format wyników (domyślnie wg rozszerzenia)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Liczba procesów roboczych")
+    parser.add_argument("--resume", action="store_true", help="Pomija dokumenty przetworzone wcześniej")
+    parser.add_argument("--gpt", action="store_true", help="Sprawdza frazy także przez GPT (klucz z OPENAI_API_KEY)")
+    args = parser.parse_args(argv)
+
+    from tracing import setup_logging
+    setup_logging()
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    files = collect_files(args.inputs)
+    phrases = read_phrases(args.phrases)
+    if not files:
+        print("Nie znaleziono plików do analizy", file=sys.stderr)
+        return 1
+    if not phrases:
+        print("Plik z frazami jest pusty", file=sys.stderr)
+        return 1
+    if args.gpt and not os.getenv("OPENAI_API_KEY"):
+        print("Opcja --gpt wymaga klucza API w zmiennej OPENAI_API_KEY", file=sys.stderr)
+        return 1
+
+    summary = run(files, phrases, args.output, fmt, args.workers, args.resume, use_gpt=args.gpt)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 1 if summary["błędy"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
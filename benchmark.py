@@ -0,0 +1,326 @@
+"""
+Powtarzalne benchmarki ścieżek krytycznych: parsowanie, dopasowanie fraz,
+podświetlanie, parser odpowiedzi GPT oraz zapytania do lokalnego serwera zgodnego z OpenAI.
+
+Działa bez dostępu do sieci (wymaga zainstalowanego modelu spaCy dla etapów spaCy).
+Wyniki można zapisać jako JSON i porównać z poprzednim przebiegiem.
+
+Użycie:
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json
+    python benchmark.py --quick --stages matching,highlight
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Słownik do generowania syntetycznego polskiego tekstu: lemat -> formy
+NOUNS = {
+    "analiza": ["analiza", "analizy", "analizie", "analizę", "analizą"],
+    "dane": ["dane", "danych", "danym", "danymi"],
+    "inteligencja": ["inteligencja", "inteligencji", "inteligencję", "inteligencją"],
+    "model": ["model", "modelu", "modelowi", "modelem", "modele", "modeli"],
+    "tekst": ["tekst", "tekstu", "tekstowi", "tekstem", "teksty", "tekstów"],
+    "system": ["system", "systemu", "systemowi", "systemem", "systemy", "systemów"],
+    "sieć": ["sieć", "sieci", "siecią"],
+    "firma": ["firma", "firmy", "firmie", "firmę", "firmą", "firm"],
+    "rynek": ["rynek", "rynku", "rynkowi", "rynkiem"],
+    "klient": ["klient", "klienta", "klientowi", "klientem", "klienci", "klientów"],
+    "wyszukiwarka": ["wyszukiwarka", "wyszukiwarki", "wyszukiwarce", "wyszukiwarkę"],
+    "strona": ["strona", "strony", "stronie", "stronę", "stroną", "stron"],
+    "treść": ["treść", "treści", "treścią"],
+    "użytkownik": ["użytkownik", "użytkownika", "użytkownikowi", "użytkownicy", "użytkowników"],
+    "proces": ["proces", "procesu", "procesowi", "procesem", "procesy"],
+}
+ADJECTIVES = {
+    "sztuczny": ["sztuczna", "sztucznej", "sztuczną", "sztuczny", "sztucznego", "sztuczne"],
+    "neuronowy": ["neuronowa", "neuronowej", "neuronową", "neuronowe", "neuronowych"],
+    "duży": ["duży", "dużego", "duża", "dużej", "duże", "dużych"],
+    "nowy": ["nowy", "nowego", "nowa", "nowej", "nowe", "nowych"],
+    "internetowy": ["internetowa", "internetowej", "internetową", "internetowe", "internetowych"],
+    "językowy": ["językowy", "językowego", "językowe", "językowych"],
+}
+FILLERS = ["i", "oraz", "w", "na", "do", "z", "że", "który", "jest", "są", "może", "bardzo",
+           "także", "dla", "przez", "po", "jak", "to", "ten", "nie", "już", "coraz", "często"]
+VERBS = ["analizuje", "wspiera", "zmienia", "wykorzystuje", "tworzy", "opisuje", "poprawia", "buduje"]
+
+SIZES = {"short": 2_000, "medium": 100_000, "large": 3_000_000}
+PHRASE_COUNTS = [1, 10, 100, 1000]
+
+
+def generate_text(rng: random.Random, target_chars: int) -> str:
+    """Generuje syntetyczny polski tekst o zadanej długości"""
+    nouns = list(NOUNS.values())
+    adjectives = list(ADJECTIVES.values())
+    sentences = []
+    length = 0
+    while length < target_chars:
+        words = []
+        for _ in range(rng.randint(6, 16)):
+            roll = rng.random()
+            if roll < 0.35:
+                words.append(rng.choice(rng.choice(nouns)))
+            elif roll < 0.55:
+                words.append(rng.choice(rng.choice(adjectives)))
+            elif roll < 0.65:
+                words.append(rng.choice(VERBS))
+            else:
+                words.append(rng.choice(FILLERS))
+            if rng.random() < 0.05:
+                words[-1] += ","
+        sentence = " ".join(words)
+        sentence = sentence[0].upper() + sentence[1:].rstrip(",") + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+        if rng.random() < 0.1:
+            sentences.append("\n\n")
+    return " ".join(sentences)[:target_chars]
+
+
+def generate_phrases(rng: random.Random, count: int) -> List[str]:
+    """Generuje listę unikalnych fraz (1-3 słowa) z podstawowych form słownika"""
+    nouns = list(NOUNS)
+    adjectives = [forms[0] for forms in ADJECTIVES.values()]
+    phrases = []
+    seen = set()
+    attempts = 0
+    while len(phrases) < count and attempts < count * 50:
+        attempts += 1
+        kind = rng.random()
+        if kind < 0.3:
+            phrase = rng.choice(nouns)
+        elif kind < 0.8:
+            phrase = f"{rng.choice(adjectives)} {rng.choice(nouns)}"
+        else:
+            phrase = f"{rng.choice(adjectives)} {rng.choice(nouns)} {rng.choice(nouns)}"
+        # Gdy kombinacji zabraknie, dodajemy numerowane frazy (bez trafień)
+        if phrase in seen:
+            phrase = f"{phrase} {attempts}"
+        seen.add(phrase)
+        phrases.append(phrase)
+    return phrases
+
+
+def generate_gpt_response(rng: random.Random, fragments: int) -> str:
+    """Generuje odpowiedź modelu w formacie ZNALEZIONE FRAGMENTY / STATYSTYKI"""
+    types = ["dokładne", "odmiana", "rozdzielone", "przestawione", "rozszerzone"]
+    lines = ["ZNALEZIONE FRAGMENTY:"]
+    for i in range(1, fragments + 1):
+        noun = rng.choice(rng.choice(list(NOUNS.values())))
+        adjective = rng.choice(rng.choice(list(ADJECTIVES.values())))
+        lines.append(f'{i}. "{adjective} {noun}" (typ: {rng.choice(types)})')
+    lines += ["", "STATYSTYKI ZNALEZIONYCH WYSTĄPIEŃ:", f"Łącznie znaleziono: {fragments}", "W tym:"]
+    lines += [f"- {typ}: {fragments // len(types)}" for typ in types]
+    return "\n".join(lines)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(func: Callable[[], object], repeat: int, work: float, unit: str) -> Dict:
+    """
+    Mierzy czasy wykonania (p50/p95), przepustowość oraz szczytowe zużycie pamięci.
+    Pamięć mierzona jest w osobnym przebiegu, bo tracemalloc spowalnia kod.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(times, 0.5)
+    return {
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(percentile(times, 0.95) * 1000, 3),
+        "throughput": round(work / p50, 3) if p50 > 0 else None,
+        "unit": unit,
+        "peak_mb": round(peak / 1024 / 1024, 3),
+        "repeat": repeat,
+    }
+
+
+def run_benchmarks(stages: List[str], sizes: List[str], phrase_counts: List[int], repeat: int,
+                   seed: int, model: str, profile: str, gpt_latency: float,
+                   lemma_table: Optional[str] = None) -> Dict[str, Dict]:
+    rng = random.Random(seed)
+    texts = {size: generate_text(random.Random(seed + list(SIZES).index(size)), SIZES[size]) for size in sizes}
+    phrase_lists = {count: generate_phrases(random.Random(seed + count), count) for count in phrase_counts}
+    results: Dict[str, Dict] = {}
+
+    def report(key: str, result: Dict) -> None:
+        results[key] = result
+        print(f"{key:<40} p50={result['p50_ms']:>10.2f} ms  p95={result['p95_ms']:>10.2f} ms  "
+              f"{result['throughput'] or 0:>12.1f} {result['unit']:<10} peak={result['peak_mb']:.1f} MB")
+
+    def runs_for(size: str) -> int:
+        return 1 if size == "large" else repeat
+
+    nlp = None
+    if {"parse", "matching", "highlight"} & set(stages):
+        from lemmatizer import load_spacy_model
+        from lemma_table import use_lemma_table
+        try:
+            nlp = use_lemma_table(load_spacy_model(model, profile), lemma_table)
+        except OSError:
+            print(f"Brak modelu spaCy '{model}' - pomijam etapy parse/matching/highlight", file=sys.stderr)
+
+    if nlp is not None:
+        from lemmatizer import AnalysisSession, highlight_text
+        from phrase_matcher import PhraseMatcher
+
+        if "matching" in stages:
+            for count in phrase_counts:
+                phrases = phrase_lists[count]
+                report(f"matching/compile/{count}", measure(lambda: PhraseMatcher(phrases, nlp), repeat, count, "phrases/s"))
+
+        for size in sizes:
+            text = texts[size]
+            megabytes = len(text.encode("utf-8")) / 1024 / 1024
+            if "parse" in stages:
+                report(f"parse/{size}", measure(lambda: AnalysisSession(text, nlp), runs_for(size), megabytes, "MB/s"))
+            session = AnalysisSession(text, nlp)
+            if "parse" in stages:
+                # Odczyt tego samego dokumentu z trwałego cache (DocBin) zamiast parsowania
+                from doc_cache import DocCache
+
+                with tempfile.TemporaryDirectory() as tmp:
+                    doc_cache = DocCache(nlp, os.path.join(tmp, "docs.sqlite"))
+                    doc_cache["benchmark"] = session.doc
+                    report(f"parse/{size}/doc_cache", measure(lambda: AnalysisSession(text, nlp, doc=doc_cache.get("benchmark")),
+                                                               runs_for(size), megabytes, "MB/s"))
+
+            for count in phrase_counts:
+                phrases = phrase_lists[count]
+                matcher = PhraseMatcher(phrases, nlp)
+                if "matching" in stages:
+                    report(f"matching/{size}/{count}", measure(lambda: matcher.match(session), runs_for(size), megabytes, "MB/s"))
+                if "highlight" in stages:
+                    variants = [
+                        {"fraza_bazowa": phrases[pid], "znaleziony_fragment": text[start:end], "start": start, "end": end}
+                        for pid, start, end in matcher.match(session)
+                    ]
+                    report(f"highlight/{size}/{count}", measure(lambda: highlight_text(text, variants), runs_for(size), megabytes, "MB/s"))
+
+    if "gpt_parse" in stages:
+        from ai_checker import AIChecker
+        from gpt_cache import GPTCache
+
+        with tempfile.TemporaryDirectory() as tmp:
+            checker = AIChecker(cache=GPTCache(os.path.join(tmp, "cache.sqlite")), api_key="benchmark")
+            for fragments in [10, 100, 1000]:
+                response = generate_gpt_response(rng, fragments)
+                report(f"gpt_parse/{fragments}", measure(lambda: checker.parse_response(response), repeat, fragments, "fragm./s"))
+
+    if "gpt_roundtrip" in stages:
+        from ai_checker import AIChecker
+        from gpt_cache import GPTCache
+        from rate_limiter import RateLimiter
+        from fake_openai_server import FakeOpenAIServer
+
+        text = texts[sizes[0]]
+        with FakeOpenAIServer(latency=gpt_latency) as server, tempfile.TemporaryDirectory() as tmp:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            for count in [c for c in phrase_counts if c <= 100]:
+                phrases = phrase_lists[count]
+                for batch_mode in [False, True]:
+                    def roundtrip():
+                        # Nowy cache przy każdym przebiegu - mierzymy zapytania, nie trafienia
+                        cache = GPTCache(os.path.join(tmp, f"cache-{time.perf_counter_ns()}.sqlite"))
+                        checker = AIChecker(cache=cache, api_key="benchmark", batch_mode=batch_mode,
+                                            rate_limiter=RateLimiter(10 ** 6, 10 ** 9))
+                        checker.check_phrases(text, phrases)
+                    mode = "batch" if batch_mode else "single"
+                    report(f"gpt_roundtrip/{mode}/{count}", measure(roundtrip, max(1, repeat // 2), count, "phrases/s"))
+
+    return results
+
+
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[Tuple[str, float]]:
+    """Wypisuje różnice p50 względem poprzedniego przebiegu i zwraca regresje"""
+    regressions = []
+    print("\nPorównanie z poprzednim przebiegiem (p50):")
+    for key, result in current.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]["p50_ms"]
+        after = result["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        marker = ""
+        if change > threshold:
+            marker = "  <-- REGRESJA"
+            regressions.append((key, change))
+        print(f"{key:<40} {before:>10.2f} -> {after:>10.2f} ms ({change:+.1%}){marker}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarki lematyzatora")
+    parser.add_argument("--stages", default="parse,matching,highlight,gpt_parse,gpt_roundtrip",
+                        help="Etapy oddzielone przecinkami")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="Rozmiary tekstów: short,medium,large")
+    parser.add_argument("--phrases", default=",".join(map(str, PHRASE_COUNTS)), help="Liczby fraz")
+    parser.add_argument("--quick", action="store_true", help="Bez tekstu wielomegabajtowego i 1000 fraz")
+    parser.add_argument("--repeat", type=int, default=5, help="Liczba powtórzeń pomiaru")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--model", default="pl_core_news_sm", help="Model spaCy")
+    parser.add_argument("--profile", default="lemma", choices=["lemma", "full"], help="Profil potoku spaCy")
+    parser.add_argument("--lemma-table", help="Tablica lematów (lemma_table.py) zamiast pełnego potoku")
+    parser.add_argument("--gpt-latency", type=float, default=0.05, help="Opóźnienie lokalnego serwera GPT (s)")
+    parser.add_argument("--save", help="Zapisuje wyniki do pliku JSON")
+    parser.add_argument("--compare", help="Porównuje z wynikami z pliku JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Próg regresji (domyślnie 10%%)")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    phrase_counts = [int(c) for c in args.phrases.split(",") if c.strip()]
+    if args.quick:
+        sizes = [s for s in sizes if s != "large"]
+        phrase_counts = [c for c in phrase_counts if c < 1000]
+
+    results = run_benchmarks(stages, sizes, phrase_counts, args.repeat, args.seed, args.model, args.profile, args.gpt_latency,
+                             args.lemma_table)
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "model": args.model,
+            "profile": args.profile,
+            "lemma_table": args.lemma_table,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nZapisano wyniki: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Tuple
+
+# Koniec zdania (wraz z ewentualnym cudzysłowem/nawiasem) lub pusta linia
+SENTENCE_END = re.compile(r'[.!?…]+["»”\')]*\s+|\n\s*\n')
+
+
+def split_into_chunks(text: str, max_chars: int = 50000, overlap_chars: int = 1000) -> List[Tuple[int, str]]:
+    """
+    Dzieli tekst na fragmenty wyrównane do granic zdań, zachodzące na siebie o overlap_chars.
+
+    Returns:
+        List[Tuple[int, str]]: Lista (przesunięcie fragmentu w tekście, treść fragmentu)
+    """
+    if len(text) <= max_chars:
+        return [(0, text)]
+
+    boundaries = [m.end() for m in SENTENCE_END.finditer(text)]
+    chunks = []
+    start = 0
+    while start < len(text):
+        limit = start + max_chars
+        if limit >= len(text):
+            end = len(text)
+        else:
+            i = bisect_right(boundaries, limit) - 1
+            if i >= 0 and boundaries[i] > start:
+                end = boundaries[i]
+            else:
+                # Zdanie dłuższe niż fragment - tniemy na ostatniej spacji
+                space = text.rfind(" ", start + 1, limit)
+                end = space + 1 if space != -1 else limit
+        chunks.append((start, text[start:end]))
+        if end >= len(text):
+            break
+
+        # Kolejny fragment zaczyna się od pierwszego zdania w obszarze zakładki
+        j = bisect_left(boundaries, end - overlap_chars)
+        if j < len(boundaries) and start < boundaries[j] < end:
+            start = boundaries[j]
+        else:
+            start = end
+    return chunks
@@ -0,0 +1,134 @@
+"""
+Trwały cache sparsowanych dokumentów spaCy.
+
+Dokumenty zapisywane są w SQLite jako DocBin (tylko atrybuty potrzebne
+analizie: tekst, lematy, granice zdań, części mowy). Klucz to hash tekstu
+oraz nazwy, wersji i składu potoku modelu, więc zmiana modelu nie zwraca
+nieaktualnych dokumentów. Po przekroczeniu limitu rozmiaru usuwane są
+najdawniej używane wpisy (LRU).
+"""
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from spacy.tokens import Doc, DocBin
+
+from lemma_table import FastLemmatizer
+from sqlite_store import connect, evict_lru
+
+# Atrybuty tokenów zapisywane w DocBin (granice zdań jawnie - bez parsera nie wynikają z HEAD)
+DOC_ATTRS = ["ORTH", "LEMMA", "SENT_START", "POS", "TAG", "MORPH"]
+
+
+def model_key(nlp) -> str:
+    """
+    Identyfikator modelu: nazwa, wersja i składniki potoku, a przy FastLemmatizer
+    także tablica lematów (jej lematy różnią się od lematów potoku spaCy).
+    """
+    meta = nlp.meta
+    key = f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}:{','.join(nlp.pipe_names)}"
+    if isinstance(nlp, FastLemmatizer):
+        key += f"+lemma_table:{nlp.table.key}"
+    return key
+
+
+class DocCache:
+    """
+    Cache dokumentów jednego modelu, używany przez iter_docs jak słownik
+    (get i przypisanie po kluczu text_key tekstu).
+    """
+
+    def __init__(self, nlp, path: str = "doc_cache.sqlite", max_bytes: int = 500 * 1024 * 1024):
+        self.nlp = nlp
+        self.path = path
+        self.max_bytes = max_bytes
+        self.model = model_key(nlp)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with connect(self.path) as conn:
+            # WAL - wiele procesów (CLI, usługa) czyta i zapisuje równocześnie
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS doc_cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_doc_cache_last_access ON doc_cache (last_access)")
+
+    def make_key(self, text_key: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text_key}".encode("utf-8")).hexdigest()
+
+    def get(self, text_key: str) -> Optional[Doc]:
+        """Zwraca zapisany dokument lub None"""
+        key = self.make_key(text_key)
+        with self._lock, connect(self.path) as conn:
+            row = conn.execute("SELECT value FROM doc_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE doc_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return next(DocBin().from_bytes(row[0]).get_docs(self.nlp.vocab))
+
+    def __setitem__(self, text_key: str, doc: Doc) -> None:
+        """Zapisuje dokument i w razie potrzeby usuwa najdawniej używane wpisy"""
+        doc_bin = DocBin(attrs=DOC_ATTRS, store_user_data=False)
+        doc_bin.add(doc)
+        data = doc_bin.to_bytes()
+        with self._lock, connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO doc_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (self.make_key(text_key), data, len(data), time.time())
+            )
+            evict_lru(conn, "doc_cache", self.max_bytes)
+
+    def stats(self) -> Dict[str, int]:
+        """Zwraca liczniki trafień/chybień oraz rozmiar cache"""
+        with self._lock, connect(self.path) as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM doc_cache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self) -> None:
+        """Usuwa wszystkie wpisy"""
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM doc_cache")
+
+
+class TieredDocCache:
+    """Słownik dokumentów w pamięci (np. stan analizy przyrostowej) przed trwałym DocCache"""
+
+    def __init__(self, memory: Dict, store: DocCache):
+        self.memory = memory
+        self.store = store
+
+    def get(self, text_key: str) -> Optional[Doc]:
+        doc = self.memory.get(text_key)
+        if doc is None:
+            doc = self.store.get(text_key)
+            if doc is not None:
+                self.memory[text_key] = doc
+        return doc
+
+    def __setitem__(self, text_key: str, doc: Doc) -> None:
+        self.memory[text_key] = doc
+        self.store[text_key] = doc
+
+
+def open_doc_cache(nlp, path: Optional[str] = None) -> Optional[DocCache]:
+    """
+    Tworzy cache dokumentów z ustawień środowiska
+    (DOC_CACHE_PATH - pusta wartość wyłącza cache, DOC_CACHE_MAX_MB - limit rozmiaru).
+    """
+    path = path if path is not None else os.getenv("DOC_CACHE_PATH", "doc_cache.sqlite")
+    if not path:
+        return None
+    return DocCache(nlp, path, int(float(os.getenv("DOC_CACHE_MAX_MB", "500")) * 1024 * 1024))
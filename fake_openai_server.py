@@ -0,0 +1,226 @@
+"""
+Lokalny serwer zgodny z API OpenAI (/v1/chat/completions) do testów i benchmarków.
+
+Odpowiada w formacie oczekiwanym przez AIChecker, zwracając dokładne wystąpienia
+frazy znalezione w tekście z promptu. Obsługuje prompty pojedyncze i wsadowe (JSON)
+oraz odpowiedzi strumieniowane (SSE, "stream": true). Pozwala symulować opóźnienie i błędy 429.
+
+Użycie:
+    python fake_openai_server.py --port 8765 --latency 0.5 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+def _extract(prompt: str, start_marker: str, end_marker: str) -> str:
+    start = prompt.find(start_marker)
+    if start == -1:
+        return ""
+    start += len(start_marker)
+    end = prompt.find(end_marker, start)
+    return prompt[start:end if end != -1 else len(prompt)]
+
+
+def _find_exact(text: str, phrase: str) -> List[str]:
+    """Zwraca wszystkie dokładne (bez rozróżniania wielkości liter) wystąpienia frazy"""
+    if not phrase:
+        return []
+    return [m.group() for m in re.finditer(re.escape(phrase), text, flags=re.IGNORECASE)]
+
+
+def build_batch_answer(prompt: str) -> str:
+    """Buduje odpowiedź JSON dla promptu wsadowego (wiele fraz)"""
+    phrase_list = _extract(prompt, "FRAZY DO WYSZUKANIA:\n", "\n\nTEKST DO PRZEANALIZOWANIA:")
+    text = _extract(prompt, "TEKST DO PRZEANALIZOWANIA:\n", "\n\nINSTRUKCJE:")
+    results = []
+    for line in phrase_list.splitlines():
+        number, _, phrase = line.partition(". ")
+        if not number.isdigit():
+            continue
+        results.append({
+            "id": int(number),
+            "fragmenty": [{"fragment": fragment, "typ": "dokładne"} for fragment in _find_exact(text, phrase)]
+        })
+    return json.dumps({"wyniki": results}, ensure_ascii=False)
+
+
+def build_answer(prompt: str) -> str:
+    """Buduje odpowiedź modelu dla promptu wygenerowanego przez AIChecker"""
+    if "FRAZY DO WYSZUKANIA:" in prompt:
+        return build_batch_answer(prompt)
+    match = re.search(r'wystąpienia frazy "(.+?)"', prompt)
+    phrase = match.group(1) if match else ""
+    text = _extract(prompt, "TEKST DO PRZEANALIZOWANIA:\n", "\n\nINSTRUKCJE:")
+    fragments = _find_exact(text, phrase)
+
+    lines = ["ZNALEZIONE FRAGMENTY:"]
+    lines += [f'{i}. "{fragment}" (typ: dokładne)' for i, fragment in enumerate(fragments, 1)]
+    lines += [
+        "",
+        "STATYSTYKI ZNALEZIONYCH WYSTĄPIEŃ:",
+        f"Łącznie znaleziono: {len(fragments)}",
+        "W tym:",
+        f"- dokładne: {len(fragments)}",
+        "- odmiana: 0",
+        "- rozdzielone: 0",
+        "- przestawione: 0",
+        "- rozszerzone: 0",
+    ]
+    return "\n".join(lines)
+
+
+class FakeOpenAIServer:
+    """Serwer uruchamiany w tle (np. w benchmarkach)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None, stream_delay: float = 0.0):
+        self.latency = latency
+        # Opóźnienie pomiędzy zdarzeniami odpowiedzi strumieniowanej
+        self.stream_delay = stream_delay
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive - klient może ponownie używać połączeń z puli
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, request: dict, answer: str, usage: dict) -> None:
+                """Wysyła odpowiedź jako zdarzenia SSE - jedna linia odpowiedzi na zdarzenie"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def event(payload) -> None:
+                    data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+                    self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                for line in answer.splitlines(keepends=True):
+                    event({"object": "chat.completion.chunk", "model": request.get("model"),
+                           "choices": [{"index": 0, "delta": {"content": line}, "finish_reason": None}]})
+                    if server.stream_delay:
+                        time.sleep(server.stream_delay)
+                event({"object": "chat.completion.chunk", "model": request.get("model"),
+                       "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    event({"object": "chat.completion.chunk", "choices": [], "usage": usage})
+                event("[DONE]")
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    self._send_json(200, {"requests": server.requests, "max_in_flight": server.max_in_flight})
+                else:
+                    self._send_json(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    fail = server.random.random() < server.error_rate
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if not self.path.endswith("/chat/completions"):
+                        self._send_json(404, {"error": {"message": "Not found"}})
+                    elif fail:
+                        self._send_json(429, {"error": {"message": "Rate limit"}}, {"Retry-After": "0"})
+                    else:
+                        prompt = request.get("messages", [{}])[-1].get("content", "")
+                        answer = build_answer(prompt)
+                        usage = {"prompt_tokens": len(prompt) // 4 + 1,
+                                 "completion_tokens": len(answer) // 4 + 1,
+                                 "total_tokens": (len(prompt) + len(answer)) // 4 + 2}
+                        if request.get("stream"):
+                            self._send_stream(request, answer, usage)
+                        else:
+                            self._send_json(200, {
+                                "object": "chat.completion",
+                                "model": request.get("model"),
+                                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                                             "finish_reason": "stop"}],
+                                "usage": usage
+                            })
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalny serwer zgodny z API OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Opóźnienie odpowiedzi w sekundach")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Odsetek odpowiedzi 429 (0-1)")
+    parser.add_argument("--stream-delay", type=float, default=0.0,
+                        help="Opóźnienie pomiędzy liniami odpowiedzi strumieniowanej (s)")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.error_rate, stream_delay=args.stream_delay)
+    print(f"Serwer działa: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from sqlite_store import connect, evict_lru
+
+
+class GPTCache:
+    """
+    Trwały cache odpowiedzi GPT zapisany w SQLite.
+    Klucz to hash (tekst, fraza, model, wersja promptu, temperatura),
+    wpisy wygasają po TTL, a po przekroczeniu limitu rozmiaru usuwane są
+    najdawniej używane wpisy (LRU).
+    """
+
+    def __init__(self, path: str = "gpt_cache.sqlite", ttl_seconds: int = 7 * 24 * 3600,
+                 max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS gpt_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_gpt_cache_last_access ON gpt_cache (last_access)")
+
+    @staticmethod
+    def make_key(text: str, phrase: str, model: str, prompt_version: str, temperature: float) -> str:
+        """Tworzy klucz cache na podstawie treści zapytania"""
+        payload = json.dumps([text, phrase, model, prompt_version, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Zwraca zapisaną odpowiedź lub None (brak wpisu lub wpis wygasł)"""
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM gpt_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM gpt_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE gpt_cache SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict) -> None:
+        """Zapisuje odpowiedź i w razie potrzeby usuwa najstarsze wpisy"""
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO gpt_cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now, now)
+            )
+            # Wygasłe wpisy, a potem najdawniej używane ponad limit rozmiaru
+            conn.execute("DELETE FROM gpt_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            evict_lru(conn, "gpt_cache", self.max_bytes)
+
+    def stats(self) -> Dict[str, int]:
+        """Zwraca liczniki trafień/chybień oraz rozmiar cache"""
+        with self._lock, connect(self.path) as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM gpt_cache").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def clear(self) -> None:
+        """Usuwa wszystkie wpisy"""
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM gpt_cache")
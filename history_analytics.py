@@ -0,0 +1,63 @@
+"""
+Analityka historii analiz na tabelach znormalizowanych (HistoryStore.analytics_frames).
+
+Zestawienia fraz i źródeł pochodzą z dziennych tabel zbiorczych SQLite, a zestawienia
+w czasie liczone są wektorowo (groupby i pivot_table w pandas) na kolumnach liczbowych
+i kategoriach - bez parsowania JSON wiersz po wierszu.
+"""
+from datetime import date
+from typing import Dict, Optional
+
+import pandas as pd
+
+from history_store import HistoryStore
+
+
+def _period(timestamps: pd.Series, freq: str) -> pd.Series:
+    """Początek okresu (dnia, tygodnia, miesiąca) dla każdej daty"""
+    return timestamps.dt.to_period(freq).dt.start_time
+
+
+def phrase_summary(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Dla każdej frazy: liczba analiz, w których jej szukano, liczba trafień,
+    liczba analiz z co najmniej jednym trafieniem i skuteczność (odsetek takich analiz).
+    """
+    summary = frames["phrases"].set_index("phrase").astype("int64")
+    summary["skuteczność"] = (
+        summary["analizy_z_trafieniem"] / summary["analizy"].where(summary["analizy"] > 0)
+    ).fillna(0.0)
+    summary.index.name = "fraza"
+    return summary.sort_values(["trafienia", "analizy"], ascending=False)
+
+
+def type_trend(frames: Dict[str, pd.DataFrame], freq: str = "D") -> pd.DataFrame:
+    """Liczba dopasowań każdego typu w kolejnych okresach (D - dni, W - tygodnie, M - miesiące)"""
+    records = frames["records"].set_index("id")["timestamp"]
+    stats = frames["stats"]
+    period = _period(records, freq).reindex(stats["record_id"]).to_numpy()
+    return stats.assign(okres=period).pivot_table(
+        index="okres", columns="typ", values="count", aggfunc="sum", fill_value=0, observed=True
+    )
+
+
+def source_share(frames: Dict[str, pd.DataFrame]) -> pd.Series:
+    """Liczba dopasowań według źródła (SpaCy, GPT)"""
+    return frames["sources"].set_index("source")["count"]
+
+
+def analyses_per_period(frames: Dict[str, pd.DataFrame], freq: str = "D") -> pd.Series:
+    """Liczba analiz w kolejnych okresach"""
+    records = frames["records"]
+    return records.groupby(_period(records["timestamp"], freq)).size().rename("analizy")
+
+
+def compute(store: HistoryStore, since: Optional[date] = None, freq: str = "D") -> Dict[str, pd.DataFrame]:
+    """Wszystkie zestawienia dla widoku analityki w zakładce Historia"""
+    frames = store.analytics_frames(since)
+    return {
+        "phrases": phrase_summary(frames),
+        "types": type_trend(frames, freq),
+        "sources": source_share(frames),
+        "analyses": analyses_per_period(frames, freq),
+    }
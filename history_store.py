@@ -0,0 +1,473 @@
+import os
+import csv
+import json
+import sqlite3
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlite_store import connect
+
+HISTORY_COLUMNS = ["timestamp", "tekst_oryginalny", "frazy_kluczowe", "wyniki", "statystyki", "wydajnosc"]
+
+# Wiersz wyniku w tabeli history_matches: (fraza, typ, źródło, start, end)
+MatchRow = Tuple[str, str, str, Optional[int], Optional[int]]
+
+
+class HistoryStore:
+    """
+    Historia analiz zapisana w SQLite (tryb WAL).
+    Zapis nowej analizy to pojedynczy INSERT (bez przepisywania całego pliku),
+    a tryb WAL pozwala na równoczesny zapis z wielu sesji Streamlit.
+    Frazy kluczowe są dodatkowo zapisywane w osobnej tabeli (history_searched) jako
+    identyfikatory napisów z indeksem (phrase_id, record_id).
+    Wyniki i statystyki są też znormalizowane - jeden wiersz na dopasowanie
+    (history_matches) i na typ (history_stats), z napisami zamienionymi na
+    identyfikatory (history_labels) - dzięki czemu analityka nie parsuje JSON.
+    Liczby dopasowań fraz w analizie (history_match_counts) są zliczane przy zapisie,
+    a analityka korzysta z dziennych zestawień fraz i źródeł (history_phrase_days,
+    history_source_days) - nie przegląda wierszy poszczególnych analiz.
+    """
+
+    def __init__(self, path: str = "history.sqlite", legacy_csv: Optional[str] = "history.csv"):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with connect(self.path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    tekst_oryginalny TEXT,
+                    frazy_kluczowe TEXT,
+                    wyniki TEXT,
+                    statystyki TEXT,
+                    wydajnosc TEXT
+                )
+            """)
+            # Bazy utworzone przed dodaniem pomiarów wydajności
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+            if "wydajnosc" not in columns:
+                conn.execute("ALTER TABLE history ADD COLUMN wydajnosc TEXT")
+            conn.execute("CREATE TABLE IF NOT EXISTS history_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_labels (
+                    id INTEGER PRIMARY KEY,
+                    label TEXT NOT NULL UNIQUE
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_searched (
+                    record_id INTEGER NOT NULL REFERENCES history (id),
+                    phrase_id INTEGER NOT NULL REFERENCES history_labels (id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_matches (
+                    record_id INTEGER NOT NULL REFERENCES history (id),
+                    phrase_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    type_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    source_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    start_pos INTEGER,
+                    end_pos INTEGER
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_stats (
+                    record_id INTEGER NOT NULL REFERENCES history (id),
+                    type_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    count INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_match_counts (
+                    record_id INTEGER NOT NULL REFERENCES history (id),
+                    phrase_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    source_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    count INTEGER NOT NULL
+                )
+            """)
+            # Dzienne zestawienia dla analityki, aktualizowane przy zapisie analizy.
+            # Klucz zaczyna się od frazy/źródła - GROUP BY czyta tabelę po kolei, bez sortowania
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_phrase_days (
+                    phrase_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    day TEXT NOT NULL,
+                    searched INTEGER NOT NULL,
+                    hits INTEGER NOT NULL,
+                    analyses_with_hits INTEGER NOT NULL,
+                    PRIMARY KEY (phrase_id, day)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_source_days (
+                    source_id INTEGER NOT NULL REFERENCES history_labels (id),
+                    day TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (source_id, day)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_matches_record ON history_matches (record_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_match_counts_record ON history_match_counts (record_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_stats_record ON history_stats (record_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_searched_phrase ON history_searched (phrase_id, record_id)")
+
+        self.migrate_phrases()
+        self.normalize_results()
+        self.build_daily()
+        if legacy_csv and os.path.exists(legacy_csv):
+            self.migrate_csv(legacy_csv)
+
+    @staticmethod
+    def _label_ids(conn: sqlite3.Connection, labels: List[str]) -> Dict[str, int]:
+        """Identyfikatory napisów (fraz, typów, źródeł) - brakujące są dodawane"""
+        labels = list(dict.fromkeys(labels))
+        conn.executemany("INSERT OR IGNORE INTO history_labels (label) VALUES (?)", [(label,) for label in labels])
+        ids = {}
+        # Zapytania partiami - limit parametrów SQLite
+        for i in range(0, len(labels), 500):
+            part = labels[i:i + 500]
+            ids.update(conn.execute(
+                f"SELECT label, id FROM history_labels WHERE label IN ({', '.join('?' * len(part))})", part
+            ).fetchall())
+        return ids
+
+    @classmethod
+    def _insert_results(cls, conn: sqlite3.Connection, record_id: int,
+                        rows: List[MatchRow], stats: Dict[str, int]) -> None:
+        """Zapisuje wyniki analizy w tabelach znormalizowanych"""
+        stats = {typ: count for typ, count in stats.items() if typ != "total"}
+        ids = cls._label_ids(conn, [label for row in rows for label in row[:3]] + list(stats))
+        matches = [(record_id, ids[phrase], ids[typ], ids[source], start, end) for phrase, typ, source, start, end in rows]
+        conn.executemany(
+            "INSERT INTO history_matches (record_id, phrase_id, type_id, source_id, start_pos, end_pos) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            matches
+        )
+        counts = Counter((phrase_id, source_id) for _, phrase_id, _, source_id, _, _ in matches)
+        conn.executemany(
+            "INSERT INTO history_match_counts (record_id, phrase_id, source_id, count) VALUES (?, ?, ?, ?)",
+            [(record_id, phrase_id, source_id, count) for (phrase_id, source_id), count in counts.items()]
+        )
+        conn.executemany(
+            "INSERT INTO history_stats (record_id, type_id, count) VALUES (?, ?, ?)",
+            [(record_id, ids[typ], count) for typ, count in stats.items()]
+        )
+
+    @classmethod
+    def _add_daily(cls, conn: sqlite3.Connection, day: str, searched: List[str], rows: List[MatchRow]) -> None:
+        """Dolicza analizę do dziennych zestawień fraz (małymi literami) i źródeł"""
+        ids = cls._label_ids(conn, searched + [row[0].lower() for row in rows] + [row[2] for row in rows])
+        # phrase_id → [searched, hits, analyses_with_hits]
+        phrases: Dict[int, List[int]] = {}
+        for phrase in searched:
+            phrases.setdefault(ids[phrase], [0, 0, 0])[0] = 1
+        for phrase, _, _, _, _ in rows:
+            counts = phrases.setdefault(ids[phrase.lower()], [0, 0, 0])
+            counts[1] += 1
+            counts[2] = 1
+        conn.executemany(
+            "INSERT INTO history_phrase_days (day, phrase_id, searched, hits, analyses_with_hits) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (phrase_id, day) DO UPDATE SET "
+            "searched = searched + excluded.searched, hits = hits + excluded.hits, "
+            "analyses_with_hits = analyses_with_hits + excluded.analyses_with_hits",
+            [(day, phrase_id, *counts) for phrase_id, counts in phrases.items()]
+        )
+        conn.executemany(
+            "INSERT INTO history_source_days (day, source_id, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (source_id, day) DO UPDATE SET count = count + excluded.count",
+            [(day, ids[source], count) for source, count in Counter(row[2] for row in rows).items()]
+        )
+
+    @staticmethod
+    def _rows_from_json(record: Dict) -> Tuple[List[MatchRow], Dict[str, int]]:
+        """Wyniki zapisane jako JSON (starsze rekordy, migracja CSV)"""
+        try:
+            variants = json.loads(record.get("wyniki") or "[]")
+            stats = json.loads(record.get("statystyki") or "{}")
+        except ValueError:
+            return [], {}
+        rows = [
+            (v.get("fraza_bazowa", ""), v.get("typ", ""), v.get("źródło", ""), v.get("start"), v.get("end"))
+            for v in variants if isinstance(v, dict)
+        ]
+        return rows, stats if isinstance(stats, dict) else {}
+
+    @classmethod
+    def _insert(cls, conn: sqlite3.Connection, record: Dict, phrases: List[str],
+                rows: Optional[List[MatchRow]] = None, stats: Optional[Dict[str, int]] = None) -> int:
+        cursor = conn.execute(
+            f"INSERT INTO history ({', '.join(HISTORY_COLUMNS)}) VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})",
+            [record.get(column) for column in HISTORY_COLUMNS]
+        )
+        record_id = cursor.lastrowid
+        searched = [phrase for phrase in dict.fromkeys(p.strip().lower() for p in phrases) if phrase]
+        ids = cls._label_ids(conn, searched)
+        conn.executemany(
+            "INSERT INTO history_searched (record_id, phrase_id) VALUES (?, ?)",
+            [(record_id, ids[phrase]) for phrase in searched]
+        )
+        if rows is None or stats is None:
+            rows, stats = cls._rows_from_json(record)
+        cls._insert_results(conn, record_id, rows, stats)
+        cls._add_daily(conn, (record.get("timestamp") or "")[:10], searched, rows)
+        return record_id
+
+    def append(self, record: Dict, phrases: List[str], rows: Optional[List[MatchRow]] = None,
+               stats: Optional[Dict[str, int]] = None) -> int:
+        """
+        Dopisuje analizę do historii i zwraca jej identyfikator.
+
+        Args:
+            rows: Wyniki (fraza, typ, źródło, start, end) - domyślnie odczytywane z JSON rekordu
+            stats: Statystyki analizy - domyślnie odczytywane z JSON rekordu
+        """
+        with connect(self.path) as conn:
+            return self._insert(conn, record, phrases, rows, stats)
+
+    def migrate_phrases(self) -> int:
+        """
+        Jednorazowo przenosi frazy kluczowe z dawnej tabeli history_phrases (napisy)
+        do history_searched (identyfikatory napisów) i usuwa starą tabelę.
+
+        Returns:
+            int: Liczba przeniesionych wierszy
+        """
+        with connect(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_phrases'"
+            ).fetchone()
+            if exists is None:
+                return 0
+            conn.execute("INSERT OR IGNORE INTO history_labels (label) SELECT DISTINCT phrase FROM history_phrases")
+            migrated = conn.execute(
+                "INSERT INTO history_searched (record_id, phrase_id) "
+                "SELECT p.record_id, l.id FROM history_phrases p JOIN history_labels l ON l.label = p.phrase"
+            ).rowcount
+            conn.execute("DROP TABLE history_phrases")
+        return migrated
+
+    def normalize_results(self) -> int:
+        """
+        Jednorazowo przepisuje wyniki zapisane jako JSON do tabel znormalizowanych.
+
+        Returns:
+            int: Liczba przetworzonych rekordów
+        """
+        normalized = 0
+        with connect(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            done = conn.execute("SELECT value FROM history_meta WHERE key = 'normalized_results'").fetchone()
+            if done is not None:
+                return 0
+            cursor = conn.execute(
+                "SELECT id, wyniki, statystyki FROM history "
+                "WHERE id NOT IN (SELECT record_id FROM history_stats)"
+            )
+            for record_id, wyniki, statystyki in cursor.fetchall():
+                rows, stats = self._rows_from_json({"wyniki": wyniki, "statystyki": statystyki})
+                self._insert_results(conn, record_id, rows, stats)
+                normalized += 1
+            conn.execute("INSERT INTO history_meta (key, value) VALUES ('normalized_results', '1')")
+        return normalized
+
+    def build_daily(self) -> int:
+        """
+        Jednorazowo wylicza dzienne zestawienia fraz i źródeł dla analiz zapisanych
+        przed ich wprowadzeniem (nowe analizy są doliczane przy zapisie).
+
+        Returns:
+            int: Liczba wierszy zestawień fraz
+        """
+        with connect(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            done = conn.execute("SELECT value FROM history_meta WHERE key = 'daily_rollup'").fetchone()
+            if done is not None:
+                return 0
+            # Frazy dopasowań łączone są bez względu na wielkość liter (jak frazy kluczowe)
+            conn.create_function("lower_label", 1, str.lower, deterministic=True)
+            conn.execute(
+                "INSERT OR IGNORE INTO history_labels (label) SELECT DISTINCT lower_label(l.label) "
+                "FROM history_labels l WHERE l.id IN (SELECT phrase_id FROM history_match_counts)"
+            )
+            built = conn.execute("""
+                INSERT INTO history_phrase_days (day, phrase_id, searched, hits, analyses_with_hits)
+                SELECT day, phrase_id, SUM(searched), SUM(hits), SUM(analyses_with_hits) FROM (
+                    SELECT substr(h.timestamp, 1, 10) AS day, s.phrase_id AS phrase_id,
+                           1 AS searched, 0 AS hits, 0 AS analyses_with_hits
+                    FROM history_searched s JOIN history h ON h.id = s.record_id
+                    UNION ALL
+                    SELECT substr(h.timestamp, 1, 10), f.id, 0, SUM(m.count), 1
+                    FROM history_match_counts m
+                    JOIN history h ON h.id = m.record_id
+                    JOIN history_labels l ON l.id = m.phrase_id
+                    JOIN history_labels f ON f.label = lower_label(l.label)
+                    GROUP BY m.record_id, f.id
+                )
+                GROUP BY day, phrase_id
+            """).rowcount
+            conn.execute("""
+                INSERT INTO history_source_days (day, source_id, count)
+                SELECT substr(h.timestamp, 1, 10), m.source_id, SUM(m.count)
+                FROM history_match_counts m JOIN history h ON h.id = m.record_id
+                GROUP BY 1, 2
+            """)
+            conn.execute("INSERT INTO history_meta (key, value) VALUES ('daily_rollup', '1')")
+        return built
+
+    def migrate_csv(self, csv_path: str) -> int:
+        """
+        Jednorazowo przenosi dane z history.csv do bazy.
+        Po migracji plik CSV zmienia nazwę na *.migrated.
+
+        Returns:
+            int: Liczba przeniesionych rekordów
+        """
+        migrated = 0
+        with connect(self.path) as conn:
+            # Blokada zapisu - tylko jedna sesja wykona migrację
+            conn.execute("BEGIN IMMEDIATE")
+            done = conn.execute("SELECT value FROM history_meta WHERE key = 'migrated_csv'").fetchone()
+            if done is None:
+                with open(csv_path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        phrases = (row.get("frazy_kluczowe") or "").split(", ")
+                        self._insert(conn, row, phrases)
+                        migrated += 1
+                conn.execute("INSERT INTO history_meta (key, value) VALUES ('migrated_csv', ?)", (csv_path,))
+        try:
+            os.replace(csv_path, csv_path + ".migrated")
+        except FileNotFoundError:
+            # Inna sesja zdążyła już przenieść plik
+            pass
+        return migrated
+
+    @staticmethod
+    def _where(day: Optional[date] = None, phrase: Optional[str] = None) -> Tuple[str, List[Any]]:
+        """
+        Buduje warunek WHERE: zakres na zindeksowanej kolumnie timestamp
+        oraz wyszukiwanie fragmentu frazy (bez względu na wielkość liter) wśród fraz kluczowych.
+        """
+        conditions = []
+        params: List[Any] = []
+        if day:
+            conditions.append("timestamp >= ? AND timestamp < ?")
+            params += [day.isoformat(), (day + timedelta(days=1)).isoformat()]
+        if phrase:
+            # Frazy zapisane są małymi literami. LIKE przegląda tylko różne napisy (history_labels),
+            # a rekordy z pasującymi frazami wybierane są przez indeks (phrase_id, record_id)
+            # tabeli history_searched. Znaki specjalne LIKE traktujemy dosłownie.
+            pattern = phrase.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(
+                "id IN (SELECT record_id FROM history_searched WHERE phrase_id IN "
+                "(SELECT id FROM history_labels WHERE label LIKE ? ESCAPE '\\'))"
+            )
+            params.append(f"%{pattern}%")
+        clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return clause, params
+
+    def count(self, day: Optional[date] = None, phrase: Optional[str] = None) -> int:
+        """Zwraca liczbę rekordów spełniających filtry"""
+        clause, params = self._where(day, phrase)
+        with connect(self.path) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM history{clause}", params).fetchone()[0]
+
+    def query(self, day: Optional[date] = None, phrase: Optional[str] = None,
+              limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Zwraca stronę rekordów (od najnowszych) spełniających filtry"""
+        clause, params = self._where(day, phrase)
+        with connect(self.path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT {', '.join(HISTORY_COLUMNS)} FROM history{clause} "
+                "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_rows(self, day: Optional[date] = None, phrase: Optional[str] = None,
+                  batch_size: int = 1000) -> Iterator[Tuple]:
+        """Zwraca kolejne rekordy (od najnowszych) partiami, bez wczytywania całej historii"""
+        clause, params = self._where(day, phrase)
+        with connect(self.path) as conn:
+            cursor = conn.execute(
+                f"SELECT {', '.join(HISTORY_COLUMNS)} FROM history{clause} ORDER BY timestamp DESC, id DESC",
+                params
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def write_csv(self, f, day: Optional[date] = None, phrase: Optional[str] = None) -> None:
+        """Zapisuje przefiltrowaną historię do pliku CSV strumieniowo"""
+        writer = csv.writer(f)
+        writer.writerow(HISTORY_COLUMNS)
+        writer.writerows(self.iter_rows(day, phrase))
+
+    def analytics_frames(self, since: Optional[date] = None) -> Dict:
+        """
+        Dane analityki jako DataFrame (kolumny liczbowe, napisy jako kategorie):
+        records (id, timestamp), stats (record_id, typ, count) oraz małe zestawienia z tabel
+        dziennych - phrases (phrase - małymi literami, analizy - liczba analiz, w których
+        szukano frazy, trafienia, analizy_z_trafieniem) i sources (source, count).
+
+        Args:
+            since: Tylko analizy od podanego dnia
+        """
+        import numpy as np
+        import pandas as pd
+
+        if since:
+            records_filter = "WHERE record_id IN (SELECT id FROM history WHERE timestamp >= ?)"
+            days_filter = "WHERE day >= ?"
+            params = [since.isoformat()]
+        else:
+            records_filter, days_filter, params = "", "", []
+
+        def integers(conn: sqlite3.Connection, sql: str, columns: int) -> np.ndarray:
+            # Same liczby - tablica NumPy bez pośredniej konwersji obiektów w pandas
+            rows = conn.execute(sql, params).fetchall()
+            return np.array(rows, dtype=np.int64).reshape(len(rows), columns)
+
+        with connect(self.path) as conn:
+            labels = dict(conn.execute("SELECT id, label FROM history_labels").fetchall())
+            records = pd.read_sql_query(
+                "SELECT id, timestamp FROM history" + (" WHERE timestamp >= ?" if since else ""), conn, params=params
+            )
+            stats = integers(conn, f"SELECT record_id, type_id, count FROM history_stats {records_filter}", 3)
+            phrases = integers(
+                conn,
+                "SELECT phrase_id, SUM(searched), SUM(hits), SUM(analyses_with_hits) "
+                f"FROM history_phrase_days {days_filter} GROUP BY phrase_id",
+                4
+            )
+            sources = integers(
+                conn, f"SELECT source_id, SUM(count) FROM history_source_days {days_filter} GROUP BY source_id", 2
+            )
+
+        def decode(ids: np.ndarray) -> pd.Categorical:
+            # Identyfikatory napisów → kategorie (kody zamiast powtarzanych napisów)
+            used, codes = np.unique(ids, return_inverse=True)
+            return pd.Categorical.from_codes(codes, categories=[labels[i] for i in used.tolist()])
+
+        records["timestamp"] = pd.to_datetime(records["timestamp"])
+        stats = pd.DataFrame({"record_id": stats[:, 0], "typ": decode(stats[:, 1]), "count": stats[:, 2]})
+        phrases = pd.DataFrame({
+            "phrase": [labels[i] for i in phrases[:, 0].tolist()],
+            "analizy": phrases[:, 1],
+            "trafienia": phrases[:, 2],
+            "analizy_z_trafieniem": phrases[:, 3],
+        })
+        sources = pd.DataFrame({"source": [labels[i] for i in sources[:, 0].tolist()], "count": sources[:, 1]})
+        return {"records": records, "stats": stats, "phrases": phrases, "sources": sources}
+
+    def version(self) -> int:
+        """Identyfikator ostatniego rekordu - zmienia się po każdym zapisie"""
+        with connect(self.path) as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM history").fetchone()[0]
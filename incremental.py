@@ -0,0 +1,227 @@
+"""
+Przyrostowa analiza tekstu edytowanego między kolejnymi uruchomieniami.
+
+Tekst dzielony jest na akapity (pusta linia), a stan analizy przechowuje
+dla każdego akapitu (klucz - skrót treści) sparsowany Doc oraz warianty
+z pozycjami względem początku akapitu (wyniki SpaCy i GPT). Przy ponownej
+analizie SpaCy i GPT uruchamiane są tylko dla nowych lub zmienionych akapitów,
+a wyniki pozostałych są przesuwane do ich aktualnych pozycji w tekście.
+Zmienione akapity parsowane i dopasowywane przez SpaCy są osobno (Doc każdego
+akapitu trafia do cache), ale do GPT wysyłane razem - jako jeden fragment
+złożony z ich dokumentów - a znalezione warianty rozdzielane są po pozycjach.
+Zmienione akapity mogą być analizowane lokalnie lub przez usługę analizy
+(AnalysisClient) - wtedy stan zawiera tylko wyniki, bez dokumentów.
+"""
+import os
+import re
+import json
+from bisect import bisect_right
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import streamlit as st
+from spacy.tokens import Doc
+
+from ai_checker import AIChecker
+from lemmatizer import ChunkResult, analysis_chunk_chars, empty_stats, iter_docs, iter_find_phrases, text_key
+from match_results import MatchResults
+from doc_cache import DocCache, TieredDocCache
+from phrase_matcher import PhraseMatcher
+from tracing import Tracer
+
+# Granica akapitów - pusta linia (także z białymi znakami)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Separator akapitów sprawdzanych razem
+PARAGRAPH_SEPARATOR = "\n\n"
+
+
+def split_paragraphs(text: str) -> List[Tuple[int, str]]:
+    """
+    Dzieli tekst na akapity.
+
+    Returns:
+        List[Tuple[int, str]]: Lista (przesunięcie akapitu w tekście, treść akapitu)
+    """
+    paragraphs = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        if match.start() > start:
+            paragraphs.append((start, text[start:match.start()]))
+        start = match.end()
+    if start < len(text):
+        paragraphs.append((start, text[start:]))
+    return paragraphs
+
+
+def split_variants(variants: MatchResults, paragraphs: List[str], starts: List[int],
+                   phrases: List[str]) -> List[MatchResults]:
+    """
+    Rozdziela warianty tekstu złożonego z akapitów (początki akapitów - starts)
+    na warianty kolejnych akapitów z pozycjami względem ich początku.
+    Warianty przekraczające granicę akapitu są pomijane.
+    """
+    split = [MatchResults(paragraph, phrases) for paragraph in paragraphs]
+    for phrase, typ, source, start, end in variants.rows():
+        i = bisect_right(starts, start) - 1
+        if i >= 0 and end <= starts[i] + len(paragraphs[i]):
+            split[i].append(phrase, start - starts[i], end - starts[i], typ, source)
+    return split
+
+
+class IncrementalAnalysis:
+    """
+    Stan analizy przyrostowej jednego użytkownika (przechowywany w st.session_state).
+    Zmiana listy fraz lub opcji analizy unieważnia zapisane wyniki, ale nie dokumenty.
+    """
+
+    def __init__(self, client=None, doc_store: Optional[DocCache] = None):
+        # AnalysisClient usługi analizy (None - analiza w procesie aplikacji)
+        self.client = client
+        # Trwały cache dokumentów - akapity znane z wcześniejszych sesji nie są parsowane
+        self.doc_store = doc_store
+        self.config_key: Optional[str] = None
+        # Skrót akapitu → warianty z pozycjami względem początku akapitu
+        self.results: Dict[str, MatchResults] = {}
+        # Skrót akapitu → sparsowany Doc (niezależny od fraz)
+        self.docs: Dict[str, Any] = {}
+
+    def run(self, text: str, phrases: List[str], nlp, gpt_batch: bool = False, use_gpt: bool = True,
+            tracer: Optional[Tracer] = None, batch_chars: Optional[int] = None,
+            api_key: Optional[str] = None, **kwargs) -> Iterator[ChunkResult]:
+        """
+        Analizuje tekst, używając ponownie wyników niezmienionych akapitów.
+        Pierwszy wynik zawiera warianty akapitów z poprzedniej analizy, kolejne -
+        warianty zmienionych akapitów: przy analizie lokalnej po SpaCy i po każdej frazie
+        sprawdzonej przez GPT, przy analizie przez usługę - w paczkach po około batch_chars znaków.
+
+        Args:
+            nlp: Model spaCy (niepotrzebny przy analizie przez usługę)
+            batch_chars: Długość paczki zmienionych akapitów sprawdzanych razem (lub wysyłanych do usługi);
+                przy analizie lokalnej ograniczona do długości fragmentu analizy
+            api_key: Klucz API OpenAI (domyślnie z sesji Streamlit)
+            **kwargs: Pozostałe opcje iter_find_phrases (np. max_gap, context_sentences)
+        """
+        tracer = tracer if tracer is not None else Tracer()
+        batch_chars = batch_chars or int(os.getenv("ANALYSIS_CHUNK_CHARS", "50000"))
+        if self.client is None:
+            # Paczka akapitów sprawdzana jest jako jeden fragment (przy GPT mieszczący się w oknie kontekstu)
+            batch_chars = min(batch_chars, analysis_chunk_chars(use_gpt, kwargs.get("chunk_chars")))
+        n_process = kwargs.get("n_process") or int(os.getenv("SPACY_N_PROCESS", "1"))
+
+        config_key = text_key(json.dumps(
+            [phrases, gpt_batch, use_gpt, sorted(kwargs.items())], ensure_ascii=False, default=str
+        ))
+        if config_key != self.config_key:
+            self.config_key = config_key
+            self.results = {}
+
+        paragraphs = split_paragraphs(text)
+        keys = [text_key(paragraph) for _, paragraph in paragraphs]
+
+        # Identyczne akapity analizujemy raz
+        changed: Dict[str, str] = {}
+        for key, (_, paragraph) in zip(keys, paragraphs):
+            if key not in self.results:
+                changed.setdefault(key, paragraph)
+        tracer.add("paragraphs_reused", sum(1 for key in keys if key not in changed))
+        tracer.add("paragraphs_analyzed", len(changed))
+
+        batches: List[List[str]] = []
+        size = 0
+        for key, paragraph in changed.items():
+            if not batches or size + len(paragraph) > batch_chars:
+                batches.append([])
+                size = 0
+            batches[-1].append(key)
+            size += len(paragraph) + len(PARAGRAPH_SEPARATOR)
+
+        stats = empty_stats()
+
+        def collect(variants: MatchResults) -> MatchResults:
+            for typ, count in variants.stats().items():
+                stats[typ] = stats.get(typ, 0) + count
+            return variants
+
+        # Wyniki z poprzedniej analizy - tylko przesunięcie pozycji
+        reused = MatchResults(text, phrases)
+        for key, (offset, _) in zip(keys, paragraphs):
+            if key not in changed:
+                reused.extend(self.results[key], offset)
+        total = len(batches) + 1
+        yield ChunkResult(0, total, collect(reused), dict(stats))
+
+        docs = TieredDocCache(self.docs, self.doc_store) if self.doc_store is not None else self.docs
+        if changed and self.client is None:
+            with tracer.stage("phrase_compile"):
+                matcher = PhraseMatcher(phrases, nlp)
+            ai_checker = AIChecker(api_key=api_key, batch_mode=gpt_batch, tracer=tracer) if use_gpt else None
+
+        # Pozycje akapitów w tekście (identyczne akapity mogą wystąpić kilka razy)
+        offsets: Dict[str, List[int]] = {}
+        for key, (offset, _) in zip(keys, paragraphs):
+            offsets.setdefault(key, []).append(offset)
+
+        def place(found: Dict[str, MatchResults]) -> MatchResults:
+            """Warianty akapitów przesunięte do wszystkich ich pozycji w tekście"""
+            placed = MatchResults(text, phrases)
+            for key, variants in found.items():
+                for offset in offsets[key]:
+                    placed.extend(variants, offset)
+            return collect(placed)
+
+        shown_errors = set()
+        for index, batch in enumerate(batches, start=1):
+            if self.client is not None:
+                with tracer.stage("service"):
+                    results = self.client.analyze([changed[key] for key in batch], phrases, use_gpt=use_gpt,
+                                                  gpt_batch=gpt_batch, api_key=api_key, options=kwargs)
+                for position, (key, result) in enumerate(zip(batch, results)):
+                    tracer.merge(result["performance"])
+                    for error in result["errors"]:
+                        if error not in shown_errors:
+                            shown_errors.add(error)
+                            st.error(error)
+                    variants = MatchResults.from_records(changed[key], phrases, result["variants"])
+                    if not result["errors"]:
+                        self.results[key] = variants
+                    yield ChunkResult(index, total, place({key: variants}), dict(stats), (position + 1) / len(batch))
+                continue
+
+            texts = [changed[key] for key in batch]
+            if len(batch) == 1:
+                # Pojedynczy (np. długi) akapit - iter_find_phrases dzieli go na fragmenty sam
+                batch_text, batch_docs = texts[0], docs
+            else:
+                # Akapity parsujemy osobno (nlp.pipe, klucze jak przy analizie pojedynczego akapitu),
+                # a sprawdzamy jako jeden fragment złożony z ich dokumentów
+                with tracer.stage("spacy_parse"):
+                    separator = nlp(PARAGRAPH_SEPARATOR)
+                    parts = []
+                    for doc in iter_docs(nlp, texts, n_process, docs):
+                        parts.extend([doc, separator])
+                    merged = Doc.from_docs(parts[:-1], ensure_whitespace=False)
+                batch_text = PARAGRAPH_SEPARATOR.join(texts)
+                batch_docs = {text_key(batch_text): merged}
+            starts = []
+            position = 0
+            for paragraph in texts:
+                starts.append(position)
+                position += len(paragraph) + len(PARAGRAPH_SEPARATOR)
+
+            # Wyniki zwracamy od razu - po SpaCy i po każdej frazie sprawdzonej przez GPT
+            errors_before = tracer.counters.get("errors", 0)
+            variants = {key: MatchResults(changed[key], phrases) for key in batch}
+            for result in iter_find_phrases(batch_text, phrases, nlp, gpt_batch=gpt_batch,
+                                            use_gpt=use_gpt, ai_checker=ai_checker, matcher=matcher,
+                                            tracer=tracer, doc_cache=batch_docs, parts=starts, **kwargs):
+                found = dict(zip(batch, split_variants(result.variants, texts, starts, phrases)))
+                for key, paragraph_variants in found.items():
+                    variants[key].extend(paragraph_variants)
+                yield ChunkResult(index, total, place(found), dict(stats), result.progress)
+            # Akapity paczki z błędem GPT sprawdzimy ponownie przy następnej analizie
+            if tracer.counters.get("errors", 0) == errors_before:
+                self.results.update(variants)
+
+        # Stan ograniczamy do akapitów aktualnego tekstu
+        current = set(keys)
+        self.results = {key: value for key, value in self.results.items() if key in current}
+        self.docs = {key: value for key, value in self.docs.items() if key in current}
@@ -0,0 +1,285 @@
+"""
+Szybka lematyzacja z tablicy forma → lemat mapowanej w pamięci (mmap).
+
+Tablica budowana jest offline na podstawie wyników modelu spaCy dla korpusu.
+Przy analizie tekst jest tylko tokenizowany, a lematy pobierane są z tablicy
+(z podręczną pamięcią LRU dla ostatnio używanych słów). Pełny potok spaCy
+uruchamiany jest wyłącznie dla zdań zawierających formy spoza tablicy
+lub formy niejednoznaczne.
+
+Plik tablicy jest otwierany tylko do odczytu przez mmap, więc procesy robocze
+(np. batch_cli.py) współdzielą te same strony pamięci systemu operacyjnego.
+
+Budowa tablicy:
+    python lemma_table.py korpus/ --output lemmy.bin
+"""
+import os
+import sys
+import json
+import hashlib
+import mmap
+import struct
+import argparse
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+MAGIC = b"LEMT"
+FORMAT_VERSION = 1
+# Nagłówek: magic, wersja formatu, długość metadanych JSON, liczba wpisów
+HEADER = struct.Struct("<4sIII")
+# Wpis indeksu: przesunięcie i długość formy, przesunięcie i długość lematu
+ENTRY = struct.Struct("<IIII")
+
+# Znacznik formy niejednoznacznej (lemat zależy od kontekstu)
+AMBIGUOUS = ""
+
+
+def build_lemma_table(nlp, texts: Iterable[str], path: str, min_share: float = 0.95,
+                      batch_size: int = 64) -> Dict[str, int]:
+    """
+    Buduje tablicę form i lematów na podstawie wyników modelu spaCy.
+    Forma, której najczęstszy lemat ma udział mniejszy niż min_share,
+    zapisywana jest jako niejednoznaczna.
+
+    Returns:
+        Dict[str, int]: Liczba form jednoznacznych i niejednoznacznych
+    """
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    for doc in nlp.pipe((text.lower() for text in texts), batch_size=batch_size):
+        for token in doc:
+            if not token.is_space:
+                counts[token.text][token.lemma_] += 1
+
+    table = {}
+    for form, lemmas in counts.items():
+        lemma, count = lemmas.most_common(1)[0]
+        table[form] = lemma if count / sum(lemmas.values()) >= min_share else AMBIGUOUS
+
+    meta = {
+        "model": f"{nlp.meta.get('lang', '')}_{nlp.meta.get('name', '')}",
+        "version": nlp.meta.get("version", ""),
+        "min_share": min_share,
+    }
+    write_lemma_table(table, path, meta)
+    ambiguous = sum(1 for lemma in table.values() if lemma == AMBIGUOUS)
+    return {"formy": len(table) - ambiguous, "niejednoznaczne": ambiguous}
+
+
+def write_lemma_table(table: Dict[str, str], path: str, meta: Optional[Dict] = None) -> None:
+    """Zapisuje tablicę: nagłówek, posortowany indeks wpisów i blok tekstu UTF-8"""
+    items = sorted((form.encode("utf-8"), lemma.encode("utf-8")) for form, lemma in table.items())
+    meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode("utf-8")
+
+    blob = bytearray()
+    index = bytearray()
+    for form, lemma in items:
+        form_offset = len(blob)
+        blob += form
+        lemma_offset = len(blob)
+        blob += lemma
+        index += ENTRY.pack(form_offset, len(form), lemma_offset, len(lemma))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes), len(items)))
+        f.write(meta_bytes)
+        f.write(index)
+        f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class LemmaTable:
+    """
+    Tablica forma → lemat odczytywana bezpośrednio z pliku mapowanego w pamięci.
+    Wyszukiwanie binarne po posortowanym indeksie - bez wczytywania tablicy do słowników.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len, self.size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Nieprawidłowy plik tablicy lematów: {path}")
+        self.meta = json.loads(self._mm[HEADER.size:HEADER.size + meta_len].decode("utf-8"))
+        # Identyfikator tablicy (np. do kluczy cache dokumentów) - zmienia się po przebudowaniu pliku
+        stat = os.stat(path)
+        self.key = hashlib.sha1(json.dumps(
+            [os.path.abspath(path), stat.st_mtime_ns, stat.st_size, self.meta], ensure_ascii=False, sort_keys=True
+        ).encode("utf-8")).hexdigest()
+        self._index_start = HEADER.size + meta_len
+        self._blob_start = self._index_start + self.size * ENTRY.size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _entry(self, i: int):
+        return ENTRY.unpack_from(self._mm, self._index_start + i * ENTRY.size)
+
+    def get(self, form: str) -> Optional[str]:
+        """
+        Zwraca lemat formy, AMBIGUOUS dla formy niejednoznacznej
+        lub None, jeśli formy nie ma w tablicy.
+        """
+        key = form.encode("utf-8")
+        mm = self._mm
+        blob = self._blob_start
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            form_offset, form_len, lemma_offset, lemma_len = self._entry(mid)
+            current = mm[blob + form_offset:blob + form_offset + form_len]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mm[blob + lemma_offset:blob + lemma_offset + lemma_len].decode("utf-8")
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class FastLemmatizer:
+    """
+    Zamiennik modelu spaCy dla find_phrases / PhraseMatcher (metody __call__ i pipe).
+    Tokenizuje tekst tokenizerem modelu, wyznacza granice zdań i uzupełnia lematy z tablicy.
+    Zdania z formami spoza tablicy lub niejednoznacznymi przetwarza pełny potok spaCy;
+    jednoznaczne lematy takich form zapamiętywane są w ograniczonej pamięci podręcznej.
+    """
+
+    def __init__(self, nlp, table: LemmaTable, cache_size: int = 100_000):
+        self.nlp = nlp
+        self.table = table
+        # Ostatnio używane formy z tablicy (lru_cache jest bezpieczny dla wątków)
+        self._lookup = lru_cache(maxsize=cache_size)(table.get)
+        # Lematy form spoza tablicy ustalone przez spaCy
+        self._learned: "OrderedDict[str, str]" = OrderedDict()
+        self._learned_size = cache_size
+        self._lock = threading.Lock()
+        self.stats = {"tokens": 0, "fallback_tokens": 0, "fallback_sentences": 0}
+
+        if "sentencizer" in nlp.pipe_names:
+            self.sentencizer = nlp.get_pipe("sentencizer")
+        else:
+            from spacy.pipeline import Sentencizer
+            self.sentencizer = Sentencizer()
+
+    def __getattr__(self, name):
+        # Pozostałe atrybuty (meta, vocab, pipe_names) pochodzą z modelu spaCy
+        if name == "nlp":
+            raise AttributeError(name)
+        return getattr(self.nlp, name)
+
+    def _resolve(self, form: str) -> Optional[str]:
+        lemma = self._lookup(form)
+        if lemma is None:
+            with self._lock:
+                lemma = self._learned.get(form)
+                if lemma is not None:
+                    self._learned.move_to_end(form)
+        return lemma or None
+
+    def _learn(self, form: str, lemma: str) -> None:
+        with self._lock:
+            self._learned[form] = lemma
+            if len(self._learned) > self._learned_size:
+                self._learned.popitem(last=False)
+
+    def __call__(self, text: str):
+        return next(self.pipe([text]))
+
+    def pipe(self, texts: Iterable[str], batch_size: int = 64, **kwargs) -> Iterator:
+        """
+        Odpowiednik nlp.pipe. Dodatkowe opcje (np. n_process) są ignorowane -
+        wyszukiwanie w tablicy jest tańsze niż uruchamianie procesów.
+        """
+        for text in texts:
+            yield self._process(text, batch_size)
+
+    def _process(self, text: str, batch_size: int):
+        doc = self.sentencizer(self.nlp.make_doc(text))
+        unresolved_sents = []
+        tokens = 0
+        for sent in doc.sents:
+            unresolved = False
+            for token in sent:
+                if token.is_space:
+                    token.lemma_ = token.text
+                    continue
+                tokens += 1
+                lemma = self._resolve(token.text)
+                if lemma is None:
+                    unresolved = True
+                else:
+                    token.lemma_ = lemma
+            if unresolved:
+                unresolved_sents.append(sent)
+
+        fallback_tokens = 0
+        if unresolved_sents:
+            # Pełny potok tylko dla zdań z nieznanymi lub niejednoznacznymi formami
+            fallback_docs = self.nlp.pipe((sent.text for sent in unresolved_sents), batch_size=batch_size)
+            for sent, fallback in zip(unresolved_sents, fallback_docs):
+                lemmas = {sent.start_char + token.idx: token.lemma_ for token in fallback}
+                for token in sent:
+                    if token.is_space or self._lookup(token.text):
+                        continue
+                    lemma = lemmas.get(token.idx) or token.text
+                    token.lemma_ = lemma
+                    fallback_tokens += 1
+                    if self._lookup(token.text) is None:
+                        self._learn(token.text, lemma)
+
+        with self._lock:
+            self.stats["tokens"] += tokens
+            self.stats["fallback_tokens"] += fallback_tokens
+            self.stats["fallback_sentences"] += len(unresolved_sents)
+        return doc
+
+
+def use_lemma_table(nlp, path: Optional[str] = None, cache_size: Optional[int] = None):
+    """
+    Zwraca FastLemmatizer, jeśli podano tablicę lematów (lub ustawiono LEMMA_TABLE_PATH),
+    w przeciwnym razie niezmieniony model spaCy.
+    """
+    path = path or os.getenv("LEMMA_TABLE_PATH")
+    if not path:
+        return nlp
+    cache_size = cache_size or int(os.getenv("LEMMA_CACHE_SIZE", "100000"))
+    return FastLemmatizer(nlp, LemmaTable(path), cache_size=cache_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from batch_cli import collect_files
+    from lemmatizer import MODEL_NAME, load_spacy_model
+
+    parser = argparse.ArgumentParser(description="Budowa tablicy forma → lemat z wyników modelu spaCy")
+    parser.add_argument("inputs", nargs="+", help="Katalogi lub wzorce glob z plikami .txt (korpus)")
+    parser.add_argument("--output", required=True, help="Plik tablicy lematów")
+    parser.add_argument("--model", default=MODEL_NAME, help="Model spaCy")
+    parser.add_argument("--min-share", type=float, default=0.95,
+                        help="Minimalny udział najczęstszego lematu formy jednoznacznej")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs)
+    if not files:
+        print("Nie znaleziono plików korpusu", file=sys.stderr)
+        return 1
+
+    def read_texts() -> Iterator[str]:
+        for path in files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield f.read()
+
+    nlp = load_spacy_model(args.model)
+    summary = build_lemma_table(nlp, read_texts(), args.output, min_share=args.min_share)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,120 @@
 import spacy
 import streamlit as st
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple, Optional, Iterator, NamedTuple
 import subprocess
 import sys
+import os
+import time
+import hashlib
+import copy
+import queue
+import threading
+from bisect import bisect_left
 from ai_checker import AIChecker
+from phrase_matcher import PhraseMatcher
+from lemma_table import use_lemma_table
+from prefilter import SentenceIndex, merge_windows, window_text
+from text_index import TextIndex
+from match_results import MatchResults
+from doc_cache import DocCache, open_doc_cache
+from chunking import split_into_chunks
+from tracing import Tracer
 import re
+import html
 
-@st.cache_resource
-def load_model():
-    """Ładuje model spaCy"""
-    try:
-        return spacy.load("pl_core_news_sm")
-    except OSError:
-        # Instalujemy model jeśli nie jest zainstalowany
-        subprocess.check_call([sys.executable, "-m", "spacy", "download", "pl_core_news_sm"])
-        return spacy.load("pl_core_news_sm")
+MODEL_NAME = "pl_core_news_sm"
+
+# Profile potoku spaCy: find_phrases potrzebuje tylko lematów, tekstu i granic zdań
+PIPELINE_PROFILES = {
+    # Bez parsera zależności i NER; granice zdań wyznacza lekki sentencizer
+    "lemma": ["parser", "ner", "senter"],
+    "full": [],
+}
 
-def find_phrases(text: str, phrases: List[str], nlp) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+def load_spacy_model(name: str = MODEL_NAME, profile: Optional[str] = None):
     """
-    Znajduje frazy w tekście używając SpaCy i GPT-4-mini.
-    Łączy wyniki z obu źródeł i usuwa duplikaty.
+    Ładuje model spaCy (bez Streamlit - np. w procesach roboczych CLI).
     
-    Returns:
-        Tuple[List[Dict[str, str]], Dict[str, int]]:
-            (Lista unikalnych wariantów, Statystyki)
+    Args:
+        name: Nazwa modelu
+        profile: Profil potoku ("lemma" lub "full", domyślnie ze zmiennej SPACY_PROFILE)
     """
-    # Inicjalizacja AI Checker
-    ai_checker = AIChecker()
+    profile = profile or os.getenv("SPACY_PROFILE", "lemma")
+    exclude = PIPELINE_PROFILES[profile]
+    try:
+        nlp = spacy.load(name, exclude=exclude)
+    except OSError:
+        # Pobieranie modelu w trakcie działania tylko na wyraźne żądanie
+        if os.getenv("SPACY_AUTO_DOWNLOAD") != "1":
+            raise OSError(
+                f"Brak modelu spaCy '{name}'. Zainstaluj go poleceniem: python -m spacy download {name}"
+            )
+        subprocess.check_call([sys.executable, "-m", "spacy", "download", name])
+        nlp = spacy.load(name, exclude=exclude)
     
-    # Lista wszystkich znalezionych wariantów
-    all_variants = []
+    if "parser" in exclude and "sentencizer" not in nlp.pipe_names:
+        nlp.add_pipe("sentencizer")
     
-    # Statystyki
-    stats = {
+    # Rozgrzewka - inicjalizacja leniwych struktur przed pierwszym dokumentem
+    nlp("Rozgrzewka modelu przed pierwszą analizą.")
+    return nlp
+
+@st.cache_resource
+def load_model():
+    """Ładuje model spaCy (z tablicą lematów, jeśli ustawiono LEMMA_TABLE_PATH)"""
+    return use_lemma_table(load_spacy_model())
+
+@st.cache_resource
+def get_doc_cache() -> Optional[DocCache]:
+    """Trwały cache sparsowanych dokumentów (DOC_CACHE_PATH, pusta wartość wyłącza)"""
+    return open_doc_cache(load_model())
+
+class AnalysisSession:
+    """
+    Sesja analizy jednego tekstu.
+    Parsuje tekst tylko raz i przechowuje Doc oraz tablice lematów/tekstów tokenów,
+    na których uruchamiane są wszystkie frazy.
+    """
+
+    def __init__(self, text: str, nlp, doc=None):
+        self.text = text
+        self.nlp = nlp
+        # Doc można przekazać z zewnątrz (np. z nlp.pipe)
+        self.doc = doc if doc is not None else nlp(text.lower())
+
+        # Tablice tokenów wyciągnięte z Doc (szybszy dostęp niż przez obiekty Token)
+        self.lemmas = [token.lemma_ for token in self.doc]
+        self.texts = [token.text for token in self.doc]
+        self.is_punct = [token.is_punct for token in self.doc]
+        self.starts = [token.idx for token in self.doc]
+        self.ends = [token.idx + len(token) for token in self.doc]
+        self.sent_starts = [bool(token.is_sent_start) for token in self.doc]
+
+    def split(self, boundaries: List[int]) -> List["AnalysisSession"]:
+        """
+        Dzieli sesję na sesje niezależnych części tekstu (np. akapitów),
+        zaczynających się na pozycjach boundaries. Pozycje tokenów pozostają
+        względem całego tekstu, więc dopasowań nie trzeba przesuwać.
+        """
+        cuts = [bisect_left(self.starts, boundary) for boundary in boundaries]
+        parts = []
+        for first, last in zip([0] + cuts, cuts + [len(self.starts)]):
+            part = copy.copy(self)
+            part.doc = self.doc[first:last]
+            for name in ("lemmas", "texts", "is_punct", "starts", "ends", "sent_starts"):
+                setattr(part, name, getattr(self, name)[first:last])
+            parts.append(part)
+        return parts
+
+
+def text_key(text: str) -> str:
+    """Klucz tekstu (np. akapitu) w pamięci podręcznej dokumentów i wyników"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def empty_stats() -> Dict[str, int]:
+    """Statystyki analizy z zerowymi licznikami wszystkich typów"""
+    return {
         "total": 0,
         "dokładne": 0,
         "odmiana": 0,
@@ -41,93 +123,387 @@ def find_phrases(text: str, phrases: List[str], nlp) -> Tuple[List[Dict[str, str
         "rozszerzone": 0,
         "lematyzacja": 0
     }
+
+
+def iter_docs(nlp, texts: List[str], n_process: int, doc_cache: Optional[Dict] = None) -> Iterator:
+    """
+    Zwraca sparsowane dokumenty tekstów w kolejności.
+    Dokumenty z doc_cache (klucz text_key) są używane ponownie, nlp.pipe parsuje tylko brakujące.
+    """
+    if doc_cache is None:
+        yield from nlp.pipe((text.lower() for text in texts), n_process=n_process)
+        return
+    keys = [text_key(text) for text in texts]
+    # Trafienia pobieramy z góry - kolejność parsowania musi się zgadzać z brakującymi
+    cached = [doc_cache.get(key) for key in keys]
+    parsed = iter(nlp.pipe(
+        (text.lower() for text, doc in zip(texts, cached) if doc is None), n_process=n_process
+    ))
+    for key, doc in zip(keys, cached):
+        if doc is None:
+            doc = next(parsed)
+            doc_cache[key] = doc
+        yield doc
+
+
+def analysis_chunk_chars(use_gpt: bool, chunk_chars: Optional[int] = None,
+                         ai_checker: Optional[AIChecker] = None) -> int:
+    """
+    Długość fragmentu analizy (domyślnie ANALYSIS_CHUNK_CHARS). Przy sprawdzaniu przez GPT
+    fragment jest ograniczony tak, by zapytanie mieściło się w oknie kontekstu modelu.
+    """
+    chunk_chars = chunk_chars or int(os.getenv("ANALYSIS_CHUNK_CHARS", "50000"))
+    if not use_gpt:
+        return chunk_chars
+    return min(chunk_chars, (ai_checker or AIChecker).max_text_chars())
+
+
+class ChunkResult(NamedTuple):
+    """
+    Nowe wyniki fragmentu tekstu zwracane przez iter_find_phrases - po dopasowaniu
+    SpaCy oraz po odpowiedzi GPT dla każdej kolejnej frazy.
+    """
+    index: int
+    total: int
+    variants: MatchResults
+    stats: Dict[str, int]
+    # Przeanalizowana część fragmentu (1.0 - fragment zakończony)
+    done: float = 1.0
+
+    @property
+    def progress(self) -> float:
+        """Postęp całej analizy (0-1)"""
+        return (self.index + self.done) / self.total
+
+
+def iter_find_phrases(text: str, phrases: List[str], nlp, gpt_batch: bool = False,
+                      chunk_chars: Optional[int] = None, overlap_chars: Optional[int] = None,
+                      n_process: Optional[int] = None, use_gpt: bool = True,
+                      ai_checker: Optional[AIChecker] = None,
+                      matcher: Optional[PhraseMatcher] = None,
+                      tracer: Optional[Tracer] = None,
+                      gpt_prefilter: Optional[bool] = None,
+                      context_sentences: Optional[int] = None,
+                      local_variants: Optional[bool] = None,
+                      max_gap: Optional[int] = None,
+                      doc_cache: Optional[Dict] = None,
+                      parts: Optional[List[int]] = None) -> Iterator[ChunkResult]:
+    """
+    Strumieniowa wersja find_phrases dla dużych tekstów.
+    Tekst dzielony jest na zachodzące na siebie fragmenty wyrównane do zdań,
+    parsowane przez nlp.pipe i sprawdzane przez GPT. Nowe warianty oraz dotychczasowe
+    statystyki zwracane są po dopasowaniu SpaCy fragmentu, po każdym wariancie odebranym
+    ze strumieniowanej odpowiedzi GPT (dowolnej frazy) oraz po zakończeniu odpowiedzi dla
+    każdej kolejnej frazy (zapytania wysyłane są przed zwróceniem wyników SpaCy). Fragmenty z GPT są odnajdywane
+    w tekście przez TextIndex (zmyślone są odrzucane), a duplikaty - również
+    z obszaru zakładki - usuwane są na podstawie pozycji w tekście.
+    
+    Args:
+        gpt_batch: Wysyła wiele fraz w jednym zapytaniu do GPT (tryb wsadowy)
+        chunk_chars: Maksymalna długość fragmentu w znakach (przy GPT ograniczona do okna kontekstu modelu)
+        overlap_chars: Długość zakładki pomiędzy fragmentami
+        n_process: Liczba procesów dla nlp.pipe
+        use_gpt: Czy sprawdzać frazy przez GPT (False - tylko SpaCy)
+        ai_checker: Gotowy AIChecker (domyślnie tworzony z ustawień sesji)
+        matcher: Skompilowany PhraseMatcher dla tych samych fraz (np. współdzielony w CLI)
+        tracer: Tracer zbierający czasy etapów i liczniki zapytań
+        gpt_prefilter: Wysyła do GPT tylko okna zdań zawierających lematy frazy
+            (frazy bez kandydatów są pomijane)
+        context_sentences: Liczba zdań kontekstu dodawanych z każdej strony okna
+        local_variants: Wyszukuje lokalnie warianty rozdzielone, przestawione i rozszerzone
+            (GPT staje się opcjonalną drugą opinią)
+        max_gap: Maksymalna liczba dodatkowych słów w oknie wariantu lokalnego
+        doc_cache: Słownik text_key(fragment) → Doc; sparsowane fragmenty są z niego
+            pobierane i do niego dopisywane (np. stan analizy przyrostowej)
+        parts: Początki niezależnych części tekstu (np. akapitów) - SpaCy dopasowuje
+            frazy w każdej części osobno, GPT sprawdza fragment w całości
+    """
+    overlap_chars = overlap_chars if overlap_chars is not None else int(os.getenv("ANALYSIS_OVERLAP_CHARS", "1000"))
+    n_process = n_process or int(os.getenv("SPACY_N_PROCESS", "1"))
+    if gpt_prefilter is None:
+        gpt_prefilter = os.getenv("GPT_PREFILTER", "1") == "1"
+    if context_sentences is None:
+        context_sentences = int(os.getenv("GPT_CONTEXT_SENTENCES", "1"))
+    if local_variants is None:
+        local_variants = os.getenv("LOCAL_VARIANTS", "1") == "1"
+    if max_gap is None:
+        max_gap = int(os.getenv("LOCAL_MAX_GAP", "3"))
     
-    # Zbiór do śledzenia unikalnych fragmentów
-    unique_fragments = set()
+    tracer = tracer if tracer is not None else Tracer()
     
-    # Dla każdej frazy
-    for phrase in phrases:
-        # 1. Szukamy przez SpaCy (lematyzacja)
-        doc = nlp(text.lower())
-        phrase_doc = nlp(phrase.lower())
+    # Inicjalizacja AI Checker
+    if use_gpt and ai_checker is None:
+        ai_checker = AIChecker(batch_mode=gpt_batch, tracer=tracer)
+    chunk_chars = analysis_chunk_chars(use_gpt, chunk_chars, ai_checker)
+    # Wspólny AIChecker mógł już zgłosić błędy we wcześniejszych wywołaniach
+    shown_errors = len(ai_checker.errors) if use_gpt else 0
+    
+    # Frazy kompilujemy do jednego matchera dla wszystkich fragmentów
+    if matcher is None:
+        with tracer.stage("phrase_compile"):
+            matcher = PhraseMatcher(phrases, nlp)
+    chunks = split_into_chunks(text, chunk_chars, overlap_chars)
+    docs = iter_docs(nlp, [chunk for _, chunk in chunks], n_process, doc_cache)
+    
+    # Statystyki
+    stats = empty_stats()
+    
+    # Pozycje już zgłoszonych wariantów (usuwanie duplikatów i zakładek fragmentów)
+    seen_spans = set()
+    
+    for index, (offset, chunk) in enumerate(chunks):
+        # nlp.pipe parsuje leniwie - czas liczymy przy pobraniu dokumentu
+        with tracer.stage("spacy_parse"):
+            session = AnalysisSession(chunk, nlp, doc=next(docs))
         
-        for sent in doc.sents:
-            for token in sent:
-                if token.lemma_ == phrase_doc[0].lemma_ or token.text == phrase_doc[0].text:
-                    match = True
-                    matched_tokens = [token]
-                    
-                    for i, phrase_token in enumerate(phrase_doc[1:], 1):
-                        if token.i + i >= len(doc):
-                            match = False
-                            break
-                            
-                        next_token = doc[token.i + i]
-                        if (next_token.lemma_ != phrase_token.lemma_ and 
-                            next_token.text != phrase_token.text):
-                            if (next_token.is_punct and token.i + i + 1 < len(doc)):
-                                next_token = doc[token.i + i + 1]
-                                if (next_token.lemma_ == phrase_token.lemma_ or 
-                                    next_token.text == phrase_token.text):
-                                    matched_tokens.append(next_token)
-                                    continue
-                            match = False
-                            break
-                        matched_tokens.append(next_token)
-                    
-                    if match:
-                        fragment = text[matched_tokens[0].idx:matched_tokens[-1].idx + len(matched_tokens[-1])]
-                        if fragment not in unique_fragments:
-                            unique_fragments.add(fragment)
-                            all_variants.append({
-                                "fraza_bazowa": phrase,
-                                "znaleziony_fragment": fragment,
-                                "typ": "lematyzacja",
-                                "źródło": "SpaCy"
-                            })
-                            stats["lematyzacja"] += 1
-                            stats["total"] += 1
+        # Jedno przejście po dokumencie (lub każdej jego części) dla wszystkich fraz
+        with tracer.stage("matching"):
+            spacy_matches = {i: [] for i in range(len(phrases))}
+            sessions = [session]
+            if parts:
+                sessions = session.split([start - offset for start in parts if offset < start < offset + len(chunk)])
+            for part in sessions:
+                token_matches = matcher.match_tokens(part.lemmas, part.texts, part.is_punct)
+                for phrase_id, start, end in matcher.match(part, token_matches):
+                    spacy_matches[phrase_id].append((offset + start, offset + end, "lematyzacja"))
+                # Słowa frazy w oknie, w innej kolejności lub z dodatkowymi słowami
+                if local_variants:
+                    for phrase_id, start, end, typ in matcher.match_session_variants(part, max_gap, token_matches):
+                        spacy_matches[phrase_id].append((offset + start, offset + end, typ))
         
-        # 2. Szukamy przez GPT-4-mini
-        found, gpt_variants, gpt_stats = ai_checker.check_phrase_with_gpt4mini(text, phrase)
+        # Zapytania do GPT wysyłamy od razu (równolegle) - trwają, gdy zwracamy wyniki SpaCy.
+        # Okna tekstu, w których szukamy fragmentów z GPT (None - cały fragment)
+        phrase_windows: List[Optional[List[Tuple[int, int]]]] = [None] * len(phrases)
+        gpt_started = time.perf_counter()
+        if use_gpt:
+            # Warianty odbierane przez wątki robocze (jeszcze przed końcem odpowiedzi) oraz wyniki
+            # kolejnych fraz trafiają do jednej kolejki - (fraza, wariant) lub (None, wynik frazy)
+            arrivals: "queue.Queue" = queue.Queue()
+            on_variant = lambda phrase, variant: arrivals.put((phrase, variant))
+            if gpt_prefilter:
+                gpt_results, phrase_windows = _check_candidate_windows(
+                    ai_checker, session, matcher, chunk, phrases, context_sentences, tracer, on_variant
+                )
+            else:
+                gpt_results = ai_checker.iter_check_phrases(chunk, phrases, on_variant)
+            stop = threading.Event()
+            threading.Thread(target=_forward_results, args=(gpt_results, arrivals, stop), daemon=True).start()
+        gpt_seconds = time.perf_counter() - gpt_started
+        steps = len(phrases) + 1 if use_gpt else 1
         
-        # Dodajemy tylko unikalne warianty z GPT
-        for variant in gpt_variants:
-            fragment = variant["fragment"]
-            if fragment not in unique_fragments:
-                unique_fragments.add(fragment)
-                typ = variant["typ"].lower()  # Normalizujemy typ do małych liter
-                all_variants.append({
-                    "fraza_bazowa": phrase,
-                    "znaleziony_fragment": fragment,
-                    "typ": typ,
-                    "źródło": "GPT-4-mini"
-                })
+        # 1. Wyniki SpaCy (lematyzacja i warianty lokalne) wszystkich fraz
+        merge_started = time.perf_counter()
+        new_variants = MatchResults(text, phrases)
+        for phrase_id, phrase in enumerate(phrases):
+            for start, end, typ in spacy_matches[phrase_id]:
+                if (start, end) in seen_spans:
+                    continue
+                seen_spans.add((start, end))
+                new_variants.append(phrase, start, end, typ, "SpaCy")
                 stats[typ] += 1
                 stats["total"] += 1
+        merge_seconds = time.perf_counter() - merge_started
+        yield ChunkResult(index, len(chunks), new_variants, dict(stats), 1 / steps)
+        
+        if not use_gpt:
+            tracer.add_time("merge", merge_seconds)
+            continue
+        
+        # 2. Wyniki GPT-4-mini kolejnych fraz - każdy fragment musi istnieć w tekście
+        # Indeks tekstu fragmentu budujemy tylko, gdy GPT zwrócił jakieś warianty
+        text_index = None
+        
+        def ground(phrase_id: int, gpt_variants: List[Dict[str, str]]) -> MatchResults:
+            """Warianty GPT frazy odnalezione w tekście (bez duplikatów)"""
+            nonlocal text_index
+            phrase = phrases[phrase_id]
+            new_variants = MatchResults(text, phrases)
+            for variant in gpt_variants:
+                if text_index is None:
+                    text_index = TextIndex(chunk)
+                spans = text_index.find_all(variant["fragment"], phrase_windows[phrase_id])
+                if not spans:
+                    # Fragment nie występuje w tekście (np. zmyślony przez model)
+                    tracer.add("gpt_rejected_fragments")
+                    continue
+                typ = variant["typ"].lower()  # Normalizujemy typ do małych liter
+                # Duplikaty (także wyników SpaCy) usuwamy po pozycji, nie po treści
+                for start, end in spans:
+                    start, end = offset + start, offset + end
+                    if (start, end) in seen_spans:
+                        continue
+                    seen_spans.add((start, end))
+                    new_variants.append(phrase, start, end, typ, "GPT-4-mini")
+                    stats[typ] = stats.get(typ, 0) + 1
+                    stats["total"] += 1
+            return new_variants
+        
+        # Numer frazy (pierwsze wystąpienie) i liczba jej wariantów zwróconych ze strumienia
+        phrase_ids: Dict[str, int] = {}
+        for phrase_id, phrase in enumerate(phrases):
+            phrase_ids.setdefault(phrase, phrase_id)
+        streamed: Dict[str, int] = {}
+        try:
+            for phrase_id, phrase in enumerate(phrases):
+                while True:
+                    # Czas GPT to czas oczekiwania na odpowiedzi (bez wyświetlania wyników)
+                    wait_started = time.perf_counter()
+                    received, item = arrivals.get()
+                    gpt_seconds += time.perf_counter() - wait_started
+                    if received is None:
+                        break
+                    # Wariant dowolnej frazy zwracamy, zanim model zakończy odpowiedź
+                    merge_started = time.perf_counter()
+                    new_variants = ground(phrase_ids[received], [item])
+                    streamed[received] = streamed.get(received, 0) + 1
+                    merge_seconds += time.perf_counter() - merge_started
+                    if len(new_variants):
+                        yield ChunkResult(index, len(chunks), new_variants, dict(stats), (phrase_id + 1) / steps)
+                if isinstance(item, Exception):
+                    raise item
+                found, gpt_variants, gpt_stats = item
+                for error in ai_checker.errors[shown_errors:]:
+                    st.error(error)
+                shown_errors = len(ai_checker.errors)
+                
+                # Warianty, których AIChecker nie przekazał wcześniej przez on_variant
+                merge_started = time.perf_counter()
+                new_variants = ground(phrase_id, gpt_variants[streamed.get(phrase, 0):])
+                merge_seconds += time.perf_counter() - merge_started
+                yield ChunkResult(index, len(chunks), new_variants, dict(stats), (phrase_id + 2) / steps)
+        finally:
+            # Przerwana analiza - niewysłane zapytania są anulowane
+            stop.set()
+        
+        tracer.add_time("gpt", gpt_seconds)
+        tracer.add_time("merge", merge_seconds)
+
+
+def _forward_results(results: Iterator, arrivals: "queue.Queue", stop: threading.Event) -> None:
+    """
+    Przekazuje kolejne wyniki fraz do kolejki jako (None, wynik) - wątek czeka na odpowiedzi,
+    a wątek analizy w tym czasie odbiera warianty strumieniowanych odpowiedzi.
+    Wyjątek przekazywany jest zamiast wyniku.
+    """
+    try:
+        for result in results:
+            arrivals.put((None, result))
+            if stop.is_set():
+                break
+    except Exception as e:
+        arrivals.put((None, e))
+    finally:
+        close = getattr(results, "close", None)
+        if close is not None:
+            close()
+
+
+def _check_candidate_windows(ai_checker: AIChecker, session: AnalysisSession, matcher: PhraseMatcher,
+                             chunk: str, phrases: List[str], context_sentences: int, tracer: Tracer,
+                             on_variant: Optional[Callable[[str, Dict[str, str]], None]] = None):
+    """
+    Wysyła do GPT tylko okna zdań z kandydatami dla każdej frazy.
+    W trybie wsadowym paczka fraz dostaje sumę ich okien.
+    on_variant przekazywana jest do AIChecker (fraza, wariant).
     
+    Returns:
+        (Iterator wyników w kolejności fraz jak iter_check_phrases,
+         okna (start, end) każdej frazy we fragmencie)
+    """
+    sentence_index = SentenceIndex(session.doc)
+    windows = [sentence_index.windows(keys, context_sentences) for keys in matcher.phrase_keys]
+    active = [i for i, phrase_windows in enumerate(windows) if phrase_windows]
+    tracer.add("gpt_skipped_phrases", len(phrases) - len(active))
+    
+    if not active:
+        return iter([(True, [], {})] * len(phrases)), windows
+    
+    if ai_checker.batch_mode:
+        union = merge_windows([window for i in active for window in windows[i]])
+        context = window_text(chunk, union)
+        tracer.add("gpt_context_chars", len(context))
+        checked = ai_checker.iter_check_phrases(context, [phrases[i] for i in active], on_variant)
+        for i in active:
+            windows[i] = union
+    else:
+        contexts = [window_text(chunk, windows[i]) for i in active]
+        tracer.add("gpt_context_chars", sum(len(context) for context in contexts))
+        checked = ai_checker.iter_phrase_contexts(
+            [(context, phrases[i]) for context, i in zip(contexts, active)], on_variant
+        )
+    
+    # Frazy bez kandydatów nie czekają na zapytania
+    active = set(active)
+    results = ((next(checked) if i in active else (True, [], {})) for i in range(len(phrases)))
+    return results, windows
+
+
+def find_phrases(text: str, phrases: List[str], nlp, gpt_batch: bool = False, **kwargs) -> Tuple[MatchResults, Dict[str, int]]:
+    """
+    Znajduje frazy w tekście używając SpaCy i GPT-4-mini.
+    Łączy wyniki z obu źródeł i usuwa duplikaty (po pozycji w tekście).
+    
+    Args:
+        gpt_batch: Wysyła wiele fraz w jednym zapytaniu do GPT (tryb wsadowy)
+        **kwargs: Pozostałe opcje iter_find_phrases (np. use_gpt, matcher)
+    
+    Returns:
+        Tuple[MatchResults, Dict[str, int]]:
+            (Unikalne warianty - kolumnowo, z widokiem listy słowników, Statystyki)
+    """
+    all_variants = MatchResults(text, phrases)
+    stats = {}
+    for result in iter_find_phrases(text, phrases, nlp, gpt_batch=gpt_batch, **kwargs):
+        all_variants.extend(result.variants)
+        stats = result.stats
     return all_variants, stats
 
 def generate_statistics(all_variants: List[Dict[str, str]], stats: Dict[str, int]) -> Dict:
     """Generuje statystyki z wyników."""
     return stats
 
+HIGHLIGHT_OPEN = '<mark style="background-color: #FFE4B5">'
+HIGHLIGHT_CLOSE = '</mark>'
+
+def _escape_html(text: str) -> str:
+    # Zamieniamy znaki nowej linii na <br> dla HTML
+    return html.escape(text).replace("\n", "<br>")
+
 def highlight_text(text: str, variants: List[Dict[str, str]]) -> str:
-    """Podświetla znalezione frazy w tekście."""
-    # Sortujemy warianty od najdłuższych do najkrótszych
-    sorted_variants = sorted(variants, key=lambda x: len(x["znaleziony_fragment"]), reverse=True)
-    
-    # Tworzymy kopię tekstu do modyfikacji
-    highlighted_text = text
+    """
+    Podświetla znalezione frazy w tekście.
+    Używa pozycji (start, end) wariantów; warianty bez pozycji wyszukiwane są
+    jednym przejściem wyrażenia regularnego. HTML budowany jest w jednym przebiegu.
+    """
+    if isinstance(variants, MatchResults):
+        # Wyniki kolumnowe - zakresy prosto z tablic
+        return _highlight_spans(text, [(start, end) for start, end in variants.spans() if end > start])
     
-    # Podświetlamy każdy wariant
-    for variant in sorted_variants:
-        fragment = variant["znaleziony_fragment"]
-        highlighted = f'<mark style="background-color: #FFE4B5">{fragment}</mark>'
-        highlighted_text = highlighted_text.replace(fragment, highlighted)
+    spans = []
+    unlocated = set()
+    for variant in variants:
+        start, end = variant.get("start"), variant.get("end")
+        if start is not None and end is not None:
+            if end > start:
+                spans.append((start, end))
+        elif variant["znaleziony_fragment"]:
+            unlocated.add(variant["znaleziony_fragment"])
     
-    # Zamieniamy znaki nowej linii na <br> dla HTML
-    highlighted_text = highlighted_text.replace("\n", "<br>")
-    
-    return f'<div style="white-space: pre-wrap;">{highlighted_text}</div>'
+    # Warianty bez pozycji (np. z historii) - wszystkie wystąpienia, najdłuższe najpierw
+    if unlocated:
+        pattern = re.compile("|".join(re.escape(f) for f in sorted(unlocated, key=len, reverse=True)))
+        spans.extend(match.span() for match in pattern.finditer(text))
+    return _highlight_spans(text, spans)
 
+def _highlight_spans(text: str, spans: List[Tuple[int, int]]) -> str:
+    parts = []
+    pos = 0
+    for start, end in merge_windows(spans):
+        parts.append(_escape_html(text[pos:start]))
+        parts.append(HIGHLIGHT_OPEN)
+        parts.append(_escape_html(text[start:end]))
+        parts.append(HIGHLIGHT_CLOSE)
+        pos = end
+    parts.append(_escape_html(text[pos:]))
+    
+    return f'<div style="white-space: pre-wrap;">{"".join(parts)}</div>'
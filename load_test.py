@@ -0,0 +1,115 @@
+"""
+Test obciążeniowy usługi analizy (analysis_service.py) z wieloma symulowanymi użytkownikami.
+
+Każdy użytkownik to osobny wątek wysyłający kolejne teksty (jak edytor klikający
+„Analizuj”). Odrzucone żądania (503) są ponawiane po Retry-After i liczone osobno.
+Bez --url usługa uruchamiana jest w tym procesie.
+
+Użycie:
+    python load_test.py --users 20 --requests 10 --workers 4
+    python load_test.py --url http://127.0.0.1:8600 --users 50 --chars 5000
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmark import generate_phrases, generate_text, percentile
+
+
+def _user(base_url: str, texts: List[str], phrases: List[str], think: float, results: Dict, lock: threading.Lock) -> None:
+    session = requests.Session()
+    for text in texts:
+        started = time.perf_counter()
+        while True:
+            try:
+                response = session.post(f"{base_url}/analyze", json={"documents": [text], "phrases": phrases},
+                                        timeout=600)
+            except requests.exceptions.RequestException:
+                with lock:
+                    results["errors"] += 1
+                break
+            if response.status_code == 503:
+                with lock:
+                    results["rejected"] += 1
+                time.sleep(float(response.headers.get("Retry-After", "1")))
+                continue
+            with lock:
+                if response.status_code == 200:
+                    results["ok"] += 1
+                    results["latencies"].append(time.perf_counter() - started)
+                else:
+                    results["errors"] += 1
+            break
+        if think:
+            time.sleep(think)
+
+
+def run(base_url: str, users: int, requests_per_user: int, chars: int, phrase_count: int,
+        think: float, seed: int) -> Dict:
+    """Uruchamia użytkowników równolegle i zwraca podsumowanie (przepustowość, opóźnienia, odrzucenia)"""
+    rng = random.Random(seed)
+    phrases = generate_phrases(rng, phrase_count)
+    results = {"ok": 0, "rejected": 0, "errors": 0, "latencies": []}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=_user, args=(
+            base_url, [generate_text(rng, chars) for _ in range(requests_per_user)], phrases, think, results, lock
+        ))
+        for _ in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    latencies = results.pop("latencies")
+    health = requests.get(f"{base_url}/health", timeout=10).json()
+    return {
+        **results,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(results["ok"] / seconds, 2) if seconds else 0.0,
+        "latency_p50": round(percentile(latencies, 0.5), 4) if latencies else None,
+        "latency_p95": round(percentile(latencies, 0.95), 4) if latencies else None,
+        "latency_max": round(max(latencies), 4) if latencies else None,
+        "avg_batch_size": round(health["batched_requests"] / health["batches"], 2) if health["batches"] else 0.0,
+        "service": health,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test obciążeniowy usługi analizy")
+    parser.add_argument("--url", help="Adres działającej usługi (domyślnie uruchamiana lokalnie)")
+    parser.add_argument("--users", type=int, default=10, help="Liczba równoczesnych użytkowników")
+    parser.add_argument("--requests", type=int, default=5, help="Liczba analiz na użytkownika")
+    parser.add_argument("--chars", type=int, default=3000, help="Długość tekstu w znakach")
+    parser.add_argument("--phrases", type=int, default=20, help="Liczba fraz")
+    parser.add_argument("--think", type=float, default=0.0, help="Przerwa pomiędzy analizami użytkownika (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, help="Procesy uruchamianej usługi")
+    parser.add_argument("--queue-size", type=int, help="Pojemność kolejki uruchamianej usługi")
+    parser.add_argument("--batch-size", type=int, help="Rozmiar paczki uruchamianej usługi")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        summary = run(args.url.rstrip("/"), args.users, args.requests, args.chars, args.phrases, args.think, args.seed)
+    else:
+        from analysis_service import AnalysisService
+
+        with AnalysisService(port=0, workers=args.workers, queue_size=args.queue_size,
+                             batch_size=args.batch_size) as service:
+            summary = run(service.base_url, args.users, args.requests, args.chars, args.phrases,
+                          args.think, args.seed)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Kolumnowe wyniki analizy.
+
+Zamiast listy słowników (z powtarzanymi kluczami i napisami dla każdego dopasowania)
+wyniki przechowywane są w tablicach NumPy: pozycje (start, end), numer frazy,
+kod typu i kod źródła. Frazy, typy i źródła zapisane są raz, w tablicach napisów.
+Statystyki liczone są wektorowo (np.bincount), a tabela pandas budowana jest
+z kolumn i kategorii tworzonych z kodów, bez słowników pośrednich.
+Dla zgodności MatchResults zachowuje się jak lista słowników wariantów.
+"""
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+import numpy as np
+
+# Kolejność typów odpowiada kolejności w statystykach analizy
+TYPES = ["dokładne", "odmiana", "rozdzielone", "przestawione", "rozszerzone", "lematyzacja"]
+SOURCES = ["SpaCy", "GPT-4-mini"]
+
+_COLUMNS = {
+    "_start": np.int64,
+    "_end": np.int64,
+    "_phrase": np.int32,
+    "_type": np.int16,
+    "_source": np.int8,
+}
+
+
+class MatchResults:
+    """
+    Warianty fraz znalezione w jednym tekście.
+    Fragment wariantu nie jest przechowywany - wycinany jest z tekstu na żądanie.
+    """
+
+    def __init__(self, text: str, phrases: Sequence[str], capacity: int = 16):
+        self.text = text
+        # Tablice napisów (bez powtórzeń) i ich kody
+        self.phrases: List[str] = []
+        self.types: List[str] = []
+        self.sources: List[str] = []
+        self._codes: Dict[str, Dict[str, int]] = {"phrases": {}, "types": {}, "sources": {}}
+        for phrase in phrases:
+            self.phrase_code(phrase)
+        for typ in TYPES:
+            self.type_code(typ)
+        for source in SOURCES:
+            self.source_code(source)
+
+        self._size = 0
+        for name, dtype in _COLUMNS.items():
+            setattr(self, name, np.empty(capacity, dtype=dtype))
+
+    def _intern(self, table: str, value: str) -> int:
+        codes = self._codes[table]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            getattr(self, table).append(value)
+        return code
+
+    def phrase_code(self, phrase: str) -> int:
+        return self._intern("phrases", phrase)
+
+    def type_code(self, typ: str) -> int:
+        return self._intern("types", typ)
+
+    def source_code(self, source: str) -> int:
+        return self._intern("sources", source)
+
+    def _reserve(self, extra: int) -> None:
+        """Powiększa kolumny (co najmniej dwukrotnie), jeśli brakuje miejsca na extra wierszy"""
+        needed = self._size + extra
+        if needed <= len(self._start):
+            return
+        capacity = max(needed, 2 * len(self._start))
+        for name in _COLUMNS:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def append(self, phrase: str, start: int, end: int, typ: str, source: str) -> None:
+        self._reserve(1)
+        i = self._size
+        self._start[i] = start
+        self._end[i] = end
+        self._phrase[i] = self.phrase_code(phrase)
+        self._type[i] = self.type_code(typ)
+        self._source[i] = self.source_code(source)
+        self._size += 1
+
+    def extend(self, other: "MatchResults", offset: int = 0) -> None:
+        """
+        Dołącza wyniki innego tekstu (np. fragmentu lub akapitu) przesunięte o offset.
+        Kody przeliczane są wektorowo przez tablice odwzorowań.
+        """
+        count = len(other)
+        if not count:
+            return
+        phrase_map = np.array([self.phrase_code(p) for p in other.phrases], dtype=np.int32)
+        type_map = np.array([self.type_code(t) for t in other.types], dtype=np.int16)
+        source_map = np.array([self.source_code(s) for s in other.sources], dtype=np.int8)
+
+        self._reserve(count)
+        rows = slice(self._size, self._size + count)
+        self._start[rows] = other.starts + offset
+        self._end[rows] = other.ends + offset
+        self._phrase[rows] = phrase_map[other.phrase_codes]
+        self._type[rows] = type_map[other.type_codes]
+        self._source[rows] = source_map[other.source_codes]
+        self._size += count
+
+    @classmethod
+    def from_records(cls, text: str, phrases: Sequence[str], records: Iterable[Dict]) -> "MatchResults":
+        """Tworzy wyniki z listy słowników wariantów (np. z JSON)"""
+        results = cls(text, phrases)
+        for record in records:
+            results.append(record["fraza_bazowa"], record["start"], record["end"], record["typ"], record["źródło"])
+        return results
+
+    # Kolumny (widoki bez kopiowania)
+    @property
+    def starts(self) -> np.ndarray:
+        return self._start[:self._size]
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._end[:self._size]
+
+    @property
+    def phrase_codes(self) -> np.ndarray:
+        return self._phrase[:self._size]
+
+    @property
+    def type_codes(self) -> np.ndarray:
+        return self._type[:self._size]
+
+    @property
+    def source_codes(self) -> np.ndarray:
+        return self._source[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _record(self, start: int, end: int, phrase: int, typ: int, source: int) -> Dict:
+        return {
+            "fraza_bazowa": self.phrases[phrase],
+            "znaleziony_fragment": self.text[start:end],
+            "typ": self.types[typ],
+            "źródło": self.sources[source],
+            "start": start,
+            "end": end
+        }
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("indeks wyniku poza zakresem")
+        return self._record(int(self._start[index]), int(self._end[index]), int(self._phrase[index]),
+                            int(self._type[index]), int(self._source[index]))
+
+    def __iter__(self) -> Iterator[Dict]:
+        columns = (self.starts.tolist(), self.ends.tolist(), self.phrase_codes.tolist(),
+                   self.type_codes.tolist(), self.source_codes.tolist())
+        for row in zip(*columns):
+            yield self._record(*row)
+
+    def to_records(self) -> List[Dict]:
+        """Lista słowników wariantów (dawny format wyników, np. do JSON)"""
+        return list(self)
+
+    def rows(self) -> List[tuple]:
+        """Wiersze (fraza, typ, źródło, start, end) bez wycinania fragmentów (np. do zapisu w bazie)"""
+        phrases, types, sources = self.phrases, self.types, self.sources
+        return [
+            (phrases[phrase], types[typ], sources[source], start, end)
+            for start, end, phrase, typ, source in zip(self.starts.tolist(), self.ends.tolist(),
+                                                      self.phrase_codes.tolist(), self.type_codes.tolist(),
+                                                      self.source_codes.tolist())
+        ]
+
+    def spans(self) -> List[tuple]:
+        """Zakresy (start, end) wszystkich wariantów"""
+        return list(zip(self.starts.tolist(), self.ends.tolist()))
+
+    def stats(self) -> Dict[str, int]:
+        """Liczba wariantów łącznie i dla każdego typu"""
+        counts = np.bincount(self.type_codes, minlength=len(self.types)).tolist()
+        return {"total": self._size, **dict(zip(self.types, counts))}
+
+    def to_dataframe(self, fragments: bool = True):
+        """
+        Tabela pandas z kolumnami wyników. Fraza, typ i źródło są kategoriami
+        tworzonymi bezpośrednio z kodów.
+        """
+        import pandas as pd
+
+        data = {
+            "fraza_bazowa": pd.Categorical.from_codes(self.phrase_codes, categories=self.phrases),
+            "typ": pd.Categorical.from_codes(self.type_codes, categories=self.types),
+            "źródło": pd.Categorical.from_codes(self.source_codes, categories=self.sources),
+            "start": self.starts,
+            "end": self.ends,
+        }
+        if fragments:
+            text = self.text
+            data["znaleziony_fragment"] = [text[start:end] for start, end in self.spans()]
+        return pd.DataFrame(data, copy=False)
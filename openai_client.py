@@ -0,0 +1,261 @@
+"""
+Klient HTTP API zgodnego z OpenAI (/chat/completions).
+
+Jedna współdzielona sesja requests (pula połączeń, keep-alive, ponowne użycie TLS),
+limity czasu połączenia i odczytu, ograniczona liczba ponowień z losowym
+opóźnieniem (full jitter) oraz bezpiecznik (circuit breaker), który po serii
+błędów wstrzymuje zapytania zamiast blokować kolejne analizy.
+Odpowiedzi mogą być strumieniowane (SSE) - treść zwracana jest fragmentami.
+"""
+import os
+import json
+import time
+import random
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateLimiter, estimate_tokens
+from tracing import Tracer, logger
+
+
+class OpenAIError(Exception):
+    """Błąd zapytania do API"""
+
+
+class AuthenticationError(OpenAIError):
+    """Nieprawidłowy klucz API (401)"""
+
+
+class CircuitOpenError(OpenAIError):
+    """Bezpiecznik otwarty - API uznane za chwilowo niedostępne"""
+
+
+class CircuitBreaker:
+    """
+    Bezpiecznik: po failure_threshold kolejnych błędach przechodzi w stan otwarty
+    i odrzuca zapytania przez reset_timeout sekund. Następnie przepuszcza jedno
+    zapytanie próbne (stan półotwarty) - sukces zamyka bezpiecznik.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        """Czas (s) do zapytania próbnego"""
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.retry_in() <= 0:
+                # Tylko jeden wątek wykonuje zapytanie próbne
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("gpt_circuit_open", extra={"data": {"failures": self.failures}})
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class OpenAIClient:
+    """
+    Współdzielony klient API (bezpieczny dla wątków).
+    Klucz API, limiter i tracer przekazywane są przy każdym zapytaniu,
+    więc jeden klient (i jedna pula połączeń) obsługuje wszystkie sesje.
+    """
+
+    # Kody odpowiedzi, po których ponawiamy zapytanie
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url: Optional[str] = None, connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_cap: float = 60.0, pool_size: Optional[int] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")).rstrip("/")
+        self.timeout: Tuple[float, float] = (
+            connect_timeout if connect_timeout is not None else float(os.getenv("GPT_CONNECT_TIMEOUT", "5")),
+            read_timeout if read_timeout is not None else float(os.getenv("GPT_READ_TIMEOUT", "60")),
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker if breaker is not None else CircuitBreaker(
+            int(os.getenv("GPT_CIRCUIT_FAILURES", "5")),
+            float(os.getenv("GPT_CIRCUIT_RESET", "30"))
+        )
+        self._random = random.Random()
+
+        pool_size = pool_size or int(os.getenv("GPT_POOL_SIZE", "16"))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Opóźnienie przed ponowieniem: Retry-After lub losowe z zakresu [0, base * 2^attempt]"""
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _send(self, api_key: str, payload: Dict, stream: bool,
+              rate_limiter: Optional[RateLimiter], tokens: int) -> Tuple[requests.Response, int]:
+        """
+        Wysyła zapytanie z ponowieniami (429/5xx, błędy połączenia i przekroczenia czasu).
+
+        Returns:
+            Tuple[requests.Response, int]: (Odpowiedź 2xx, liczba ponowień)
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"API niedostępne - ponowna próba za {self.breaker.retry_in():.0f} s")
+
+        for attempt in range(self.max_retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.acquire(tokens)
+            retry_after = None
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/chat/completions",
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    json=payload,
+                    timeout=self.timeout,
+                    stream=stream
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+                logger.warning("gpt_connection_retry", extra={"data": {"attempt": attempt, "error": str(e)}})
+            except Exception:
+                # Pozostałe błędy (np. ChunkedEncodingError) - bez zapisu porażki
+                # bezpiecznik w stanie HALF_OPEN blokowałby zapytania na stałe
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    # API odpowiada - także błędy klienta (4xx) zamykają bezpiecznik
+                    self.breaker.record_success()
+                    if response.status_code >= 400:
+                        response.close()
+                    if response.status_code == 401:
+                        raise AuthenticationError("Nieprawidłowy klucz API")
+                    response.raise_for_status()
+                    return response, attempt
+                response.close()
+                if attempt == self.max_retries:
+                    self.breaker.record_failure()
+                    response.raise_for_status()
+                retry_after = response.headers.get("Retry-After")
+            time.sleep(self.backoff_delay(attempt, retry_after))
+        raise OpenAIError("Przekroczono liczbę ponowień")
+
+    def chat(self, api_key: str, payload: Dict, rate_limiter: Optional[RateLimiter] = None,
+             tracer: Optional[Tracer] = None) -> Dict:
+        """Zwraca pełną odpowiedź JSON /chat/completions"""
+        prompt = payload["messages"][-1]["content"]
+        started = time.perf_counter()
+        retries, status = 0, None
+        try:
+            response, retries = self._send(api_key, payload, False, rate_limiter, estimate_tokens(prompt))
+            status = response.status_code
+            data = response.json()
+        except Exception:
+            if tracer is not None:
+                tracer.record_api_call(time.perf_counter() - started, estimate_tokens(prompt), 0, retries, status)
+            raise
+        if tracer is not None:
+            usage = data.get("usage") or {}
+            tracer.record_api_call(
+                time.perf_counter() - started,
+                usage.get("prompt_tokens", estimate_tokens(prompt)),
+                usage.get("completion_tokens", 0),
+                retries,
+                status
+            )
+        return data
+
+    def stream_chat(self, api_key: str, payload: Dict, rate_limiter: Optional[RateLimiter] = None,
+                    tracer: Optional[Tracer] = None) -> Iterator[str]:
+        """
+        Strumieniuje odpowiedź (Server-Sent Events) i zwraca kolejne fragmenty treści.
+        Ponowienia możliwe są tylko przed otrzymaniem pierwszego fragmentu.
+        """
+        prompt = payload["messages"][-1]["content"]
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        started = time.perf_counter()
+        retries, status = 0, None
+        usage: Dict = {}
+        completion_chars = 0
+        try:
+            response, retries = self._send(api_key, payload, True, rate_limiter, estimate_tokens(prompt))
+            status = response.status_code
+            with response:
+                for data in iter_sse_data(response):
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            completion_chars += len(content)
+                            yield content
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            # Zerwany strumień (timeout odczytu, rozłączenie) też liczy się jako awaria API
+            if status is not None and isinstance(e, requests.exceptions.RequestException):
+                self.breaker.record_failure()
+            if tracer is not None:
+                tracer.record_api_call(time.perf_counter() - started, estimate_tokens(prompt), 0, retries, status)
+            raise
+        if tracer is not None:
+            tracer.record_api_call(
+                time.perf_counter() - started,
+                usage.get("prompt_tokens", estimate_tokens(prompt)),
+                usage.get("completion_tokens", completion_chars // 4 + 1),
+                retries,
+                status
+            )
+
+
+def iter_sse_data(response: requests.Response) -> Iterator[str]:
+    """Zwraca pola "data" kolejnych zdarzeń strumienia SSE"""
+    # text/event-stream bez charset - requests przyjąłby ISO-8859-1
+    response.encoding = "utf-8"
+    data_lines = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+            continue
+        # Pusta linia kończy zdarzenie
+        if data_lines:
+            yield "\n".join(data_lines)
+            data_lines = []
+    if data_lines:
+        yield "\n".join(data_lines)
@@ -0,0 +1,266 @@
+from bisect import bisect_left
+from typing import List, Dict, Optional, Set, Tuple
+from prefilter import phrase_keys
+
+
+class _TrieNode:
+    """Węzeł drzewa fraz - przejścia po lemacie lub formie tekstowej tokenu"""
+
+    __slots__ = ("children", "by_lemma", "by_text", "phrase_ids")
+
+    def __init__(self):
+        self.children: Dict[Tuple[str, str], "_TrieNode"] = {}
+        self.by_lemma: Dict[str, List["_TrieNode"]] = {}
+        self.by_text: Dict[str, List["_TrieNode"]] = {}
+        self.phrase_ids: List[int] = []
+
+    def child(self, lemma: str, text: str) -> "_TrieNode":
+        key = (lemma, text)
+        node = self.children.get(key)
+        if node is None:
+            node = _TrieNode()
+            self.children[key] = node
+            self.by_lemma.setdefault(lemma, []).append(node)
+            self.by_text.setdefault(text, []).append(node)
+        return node
+
+    def step(self, lemma: str, text: str) -> List["_TrieNode"]:
+        """Zwraca węzły, do których pasuje token (zgodny lemat lub tekst)"""
+        by_lemma = self.by_lemma.get(lemma, ())
+        by_text = self.by_text.get(text, ())
+        if not by_text:
+            return list(by_lemma)
+        if not by_lemma:
+            return list(by_text)
+        nodes = list(by_lemma)
+        nodes.extend(node for node in by_text if node not in by_lemma)
+        return nodes
+
+
+class PhraseMatcher:
+    """
+    Skompilowany matcher wielu fraz.
+    Frazy są parsowane raz (nlp.pipe) i zapisywane w drzewie sekwencji lematów/form,
+    dzięki czemu jedno przejście po dokumencie znajduje wystąpienia wszystkich fraz.
+    Pomiędzy słowami frazy dopuszczalny jest jeden znak interpunkcyjny.
+    """
+
+    def __init__(self, phrases: List[str], nlp):
+        self.phrases = list(phrases)
+        self.root = _TrieNode()
+        self.max_length = 0
+        # Klucze (lematy, formy, rdzenie) fraz dla wstępnego filtra zapytań GPT
+        self.phrase_keys: List[Set[str]] = []
+        # Słowa fraz (bez interpunkcji) dla dopasowań w oknie - match_variants
+        self.phrase_words: List[List[Tuple[str, str]]] = []
+
+        for phrase_id, phrase_doc in enumerate(nlp.pipe([p.lower() for p in self.phrases])):
+            self.phrase_keys.append(phrase_keys(phrase_doc))
+            self.phrase_words.append([
+                (token.lemma_, token.text) for token in phrase_doc if not token.is_punct and not token.is_space
+            ])
+            tokens = [(token.lemma_, token.text) for token in phrase_doc]
+            if not tokens:
+                continue
+            node = self.root
+            for lemma, text in tokens:
+                node = node.child(lemma, text)
+            node.phrase_ids.append(phrase_id)
+            self.max_length = max(self.max_length, len(tokens))
+
+    def match_tokens(self, lemmas: List[str], texts: List[str], is_punct: List[bool]) -> List[Tuple[int, int, int]]:
+        """
+        Dopasowuje frazy do tablic tokenów.
+
+        Returns:
+            List[Tuple[int, int, int]]: Lista (id frazy, indeks pierwszego tokenu, indeks ostatniego tokenu)
+        """
+        n_tokens = len(lemmas)
+        root = self.root
+        matches = []
+
+        for start in range(n_tokens):
+            first_nodes = root.step(lemmas[start], texts[start])
+            if not first_nodes:
+                continue
+
+            seen = set()
+            stack = [(node, start) for node in first_nodes]
+            while stack:
+                node, pos = stack.pop()
+                for phrase_id in node.phrase_ids:
+                    key = (phrase_id, pos)
+                    if key not in seen:
+                        seen.add(key)
+                        matches.append((phrase_id, start, pos))
+
+                if not node.children:
+                    continue
+                nxt = pos + 1
+                if nxt >= n_tokens:
+                    continue
+                for child in node.step(lemmas[nxt], texts[nxt]):
+                    stack.append((child, nxt))
+                # Pomijamy jeden znak interpunkcyjny
+                if is_punct[nxt] and nxt + 1 < n_tokens:
+                    for child in node.step(lemmas[nxt + 1], texts[nxt + 1]):
+                        stack.append((child, nxt + 1))
+
+        matches.sort(key=lambda m: (m[1], m[2], m[0]))
+        return matches
+
+    def match(self, session, token_matches: Optional[List[Tuple[int, int, int]]] = None) -> List[Tuple[int, int, int]]:
+        """
+        Dopasowuje frazy do sesji analizy (AnalysisSession).
+
+        Args:
+            token_matches: Wynik match_tokens dla tej sesji, jeśli został już obliczony
+
+        Returns:
+            List[Tuple[int, int, int]]: Lista (id frazy, start, end) - zakresy znakowe w tekście
+        """
+        if token_matches is None:
+            token_matches = self.match_tokens(session.lemmas, session.texts, session.is_punct)
+        return [
+            (phrase_id, session.starts[first], session.ends[last])
+            for phrase_id, first, last in token_matches
+        ]
+
+    def match_variants(self, lemmas: List[str], texts: List[str], is_punct: List[bool],
+                       sent_starts: List[bool], max_gap: int = 3,
+                       token_matches: Optional[List[Tuple[int, int, int]]] = None) -> List[Tuple[int, int, int, str]]:
+        """
+        Znajduje wystąpienia fraz wielowyrazowych, które nie są ciągłe:
+        wszystkie słowa frazy (lemat lub forma) w jednym zdaniu, w oknie o długości
+        liczba słów frazy + max_gap, w dowolnej kolejności.
+        Typy jak w AIChecker: przestawione (inna kolejność), rozszerzone (dodatkowe słowa
+        pomiędzy), rozdzielone (słowa przerwane tylko znakami interpunkcyjnymi).
+        Wystąpienia ciągłe (match_tokens; można przekazać już obliczone w token_matches) są pomijane.
+
+        Returns:
+            List[Tuple[int, int, int, str]]: Lista (id frazy, indeks pierwszego tokenu, indeks ostatniego tokenu, typ)
+        """
+        # Słowa dokumentu (bez interpunkcji i białych znaków) oraz numery ich zdań
+        words = []
+        word_sents = []
+        sent_id = -1
+        for i in range(len(lemmas)):
+            if sent_starts[i]:
+                sent_id += 1
+            if not is_punct[i] and not texts[i].isspace():
+                words.append(i)
+                word_sents.append(sent_id)
+
+        by_lemma: Dict[str, List[int]] = {}
+        by_text: Dict[str, List[int]] = {}
+        for w, i in enumerate(words):
+            by_lemma.setdefault(lemmas[i], []).append(w)
+            by_text.setdefault(texts[i], []).append(w)
+
+        # Tokeny już objęte ciągłymi dopasowaniami danej frazy
+        contiguous: Dict[int, Set[int]] = {}
+        if token_matches is None:
+            token_matches = self.match_tokens(lemmas, texts, is_punct)
+        for phrase_id, first, last in token_matches:
+            contiguous.setdefault(phrase_id, set()).update(range(first, last + 1))
+
+        matches = set()
+        # Wystąpienia słowa frazy (lemat lub forma) - wspólne dla wszystkich fraz
+        occurrences: Dict[Tuple[str, str], List[int]] = {}
+        for phrase_id, phrase_words in enumerate(self.phrase_words):
+            k = len(phrase_words)
+            if k < 2:
+                continue
+            positions = []
+            for word in phrase_words:
+                found = occurrences.get(word)
+                if found is None:
+                    lemma, text = word
+                    found = sorted(set(by_lemma.get(lemma, ())) | set(by_text.get(text, ())))
+                    occurrences[word] = found
+                if not found:
+                    break
+                positions.append(found)
+            if len(positions) < k:
+                continue
+
+            width = k + max_gap
+            excluded = contiguous.get(phrase_id, set())
+            anchor = min(range(k), key=lambda j: len(positions[j]))
+            for w in positions[anchor]:
+                chosen = self._choose_nearest(positions, anchor, w, width, word_sents)
+                if chosen is None:
+                    continue
+                first_w, last_w = min(chosen), max(chosen)
+                if last_w - first_w + 1 > width:
+                    continue
+                if any(words[c] in excluded for c in chosen):
+                    continue
+                typ = self._classify(chosen, words)
+                if typ is not None:
+                    matches.add((phrase_id, words[first_w], words[last_w], typ))
+
+        return sorted(matches, key=lambda m: (m[1], m[2], m[0]))
+
+    @staticmethod
+    def _choose_nearest(positions: List[List[int]], anchor: int, w: int, width: int,
+                        word_sents: List[int]) -> Optional[List[int]]:
+        """Dla każdego słowa frazy wybiera najbliższe kotwicy, niewykorzystane wystąpienie z tego samego zdania"""
+        chosen = [0] * len(positions)
+        chosen[anchor] = w
+        used = {w}
+        for j, found in enumerate(positions):
+            if j == anchor:
+                continue
+            best = None
+            i = bisect_left(found, w)
+            left, right = i - 1, i
+            # Przeglądamy wystąpienia na zewnątrz od kotwicy
+            while left >= 0 or right < len(found):
+                candidates = []
+                if left >= 0:
+                    candidates.append(found[left])
+                if right < len(found):
+                    candidates.append(found[right])
+                candidate = min(candidates, key=lambda c: abs(c - w))
+                if abs(candidate - w) >= width:
+                    break
+                if candidate not in used and word_sents[candidate] == word_sents[w]:
+                    best = candidate
+                    break
+                if left >= 0 and candidate == found[left]:
+                    left -= 1
+                else:
+                    right += 1
+            if best is None:
+                return None
+            chosen[j] = best
+            used.add(best)
+        return chosen
+
+    @staticmethod
+    def _classify(chosen: List[int], words: List[int]) -> Optional[str]:
+        """Typ dopasowania dla słów frazy (indeksy słów w kolejności frazy)"""
+        if any(b <= a for a, b in zip(chosen, chosen[1:])):
+            return "przestawione"
+        if chosen[-1] - chosen[0] + 1 > len(chosen):
+            return "rozszerzone"
+        if words[chosen[-1]] - words[chosen[0]] + 1 > len(chosen):
+            return "rozdzielone"
+        # Wystąpienie ciągłe - znajduje je match_tokens
+        return None
+
+    def match_session_variants(self, session, max_gap: int = 3,
+                               token_matches: Optional[List[Tuple[int, int, int]]] = None) -> List[Tuple[int, int, int, str]]:
+        """
+        match_variants dla sesji analizy (AnalysisSession).
+
+        Returns:
+            List[Tuple[int, int, int, str]]: Lista (id frazy, start, end, typ) - zakresy znakowe w tekście
+        """
+        return [
+            (phrase_id, session.starts[first], session.ends[last], typ)
+            for phrase_id, first, last, typ in self.match_variants(
+                session.lemmas, session.texts, session.is_punct, session.sent_starts, max_gap, token_matches
+            )
+        ]
@@ -0,0 +1,89 @@
+"""
+Wstępny filtr kandydatów dla zapytań GPT.
+
+Zamiast całego tekstu do modelu trafiają tylko okna - zdania zawierające
+któryś z lematów frazy, poszerzone o sąsiednie zdania (kontekst).
+Frazy bez żadnego kandydata w tekście nie wymagają zapytania.
+"""
+from typing import Dict, List, Set, Tuple
+
+# Długość rdzenia - pozwala objąć formy, które model zlematyzował inaczej niż frazę
+STEM_CHARS = 4
+# Separator okien w tekście wysyłanym do modelu
+WINDOW_SEPARATOR = "\n[...]\n"
+
+
+def _token_keys(token) -> Set[str]:
+    keys = {token.lemma_, token.text}
+    if token.is_alpha and len(token.lemma_) > STEM_CHARS:
+        keys.add(token.lemma_[:STEM_CHARS])
+    return keys
+
+
+def phrase_keys(phrase_doc) -> Set[str]:
+    """
+    Klucze frazy: lematy, formy i rdzenie jej słów.
+    Słowa funkcyjne (np. "w", "na") są pomijane, chyba że fraza składa się tylko z nich.
+    """
+    tokens = [token for token in phrase_doc if not token.is_punct and not token.is_space]
+    content = [token for token in tokens if not token.is_stop] or tokens
+    keys: Set[str] = set()
+    for token in content:
+        keys |= _token_keys(token)
+    return keys
+
+
+class SentenceIndex:
+    """
+    Indeks zdań dokumentu: klucz (lemat/forma/rdzeń) → numery zdań, w których występuje.
+    Budowany raz na fragment tekstu i używany dla wszystkich fraz.
+    """
+
+    def __init__(self, doc):
+        self.sentences: List[Tuple[int, int]] = []
+        self.index: Dict[str, Set[int]] = {}
+        for sent_id, sent in enumerate(doc.sents):
+            self.sentences.append((sent.start_char, sent.end_char))
+            for token in sent:
+                if token.is_punct or token.is_space:
+                    continue
+                for key in _token_keys(token):
+                    self.index.setdefault(key, set()).add(sent_id)
+
+    def windows(self, keys: Set[str], context_sentences: int = 1) -> List[Tuple[int, int]]:
+        """
+        Zwraca okna (start, end) w tekście: zdania z kluczami frazy poszerzone
+        o context_sentences zdań z każdej strony. Nakładające się okna są scalane.
+        """
+        hits: Set[int] = set()
+        for key in keys:
+            hits |= self.index.get(key, set())
+        if not hits:
+            return []
+
+        last = len(self.sentences) - 1
+        windows: List[List[int]] = []
+        for sent_id in sorted(hits):
+            first = max(0, sent_id - context_sentences)
+            end = min(last, sent_id + context_sentences)
+            if windows and first <= windows[-1][1] + 1:
+                windows[-1][1] = max(windows[-1][1], end)
+            else:
+                windows.append([first, end])
+        return [(self.sentences[first][0], self.sentences[end][1]) for first, end in windows]
+
+
+def merge_windows(windows: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Scala nakładające się lub stykające zakresy (np. okna kilku fraz w paczce, podświetlenia)"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def window_text(text: str, windows: List[Tuple[int, int]]) -> str:
+    """Łączy okna w tekst wysyłany do modelu"""
+    return WINDOW_SEPARATOR.join(text[start:end] for start, end in windows)
@@ -0,0 +1,78 @@
+import os
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Wiadro żetonów odnawiane w sposób ciągły.
+    capacity żetonów na minutę, pobranie blokuje do czasu uzupełnienia.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Pobiera żetony, czekając jeśli to konieczne.
+
+        Returns:
+            float: Łączny czas oczekiwania w sekundach
+        """
+        if self.capacity <= 0:
+            return 0.0
+        # Żądanie większe niż pojemność wiadra nigdy by się nie zmieściło
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """Limity zapytań na minutę (RPM) i tokenów na minutę (TPM) dla API"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens: int) -> float:
+        """Czeka na zgodę na jedno zapytanie zużywające podaną liczbę tokenów"""
+        return self.requests.acquire(1) + self.tokens.acquire(tokens)
+
+
+def rate_limiter_from_env(processes: int = 1) -> RateLimiter:
+    """
+    Limiter z limitami GPT_REQUESTS_PER_MINUTE i GPT_TOKENS_PER_MINUTE.
+    Limity dotyczą całej aplikacji - przy kilku procesach roboczych (każdy ma własny
+    limiter) każdy dostaje równą część, więc łącznie nie przekraczają limitu konta.
+    """
+    processes = max(1, processes)
+    return RateLimiter(
+        float(os.getenv("GPT_REQUESTS_PER_MINUTE", "60")) / processes,
+        float(os.getenv("GPT_TOKENS_PER_MINUTE", "40000")) / processes
+    )
+
+
+# Przybliżona liczba znaków tekstu na token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Przybliżona liczba tokenów (ok. 4 znaki na token)"""
+    return len(text) // CHARS_PER_TOKEN + 1
@@ -0,0 +1,38 @@
+"""
+Wspólne funkcje baz SQLite (cache GPT, cache dokumentów, historia analiz).
+"""
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def connect(path: str) -> Iterator[sqlite3.Connection]:
+    """Połączenie z bazą na czas bloku - transakcja zatwierdzana na końcu, wycofywana przy błędzie"""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def evict_lru(conn: sqlite3.Connection, table: str, max_bytes: int) -> int:
+    """
+    Usuwa najdawniej używane wpisy (kolumny key, size, last_access),
+    dopóki łączny rozmiar tabeli przekracza max_bytes.
+
+    Returns:
+        int: Liczba usuniętych wpisów
+    """
+    total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    to_delete = []
+    for key, size in conn.execute(f"SELECT key, size FROM {table} ORDER BY last_access ASC"):
+        if total <= max_bytes:
+            break
+        to_delete.append((key,))
+        total -= size
+    conn.executemany(f"DELETE FROM {table} WHERE key = ?", to_delete)
+    return len(to_delete)
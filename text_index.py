@@ -0,0 +1,120 @@
+"""
+Indeks tekstu do weryfikacji fragmentów zwróconych przez GPT.
+
+Tekst jest normalizowany (małe litery, bez znaków diakrytycznych, jednolite
+cudzysłowy i myślniki, zwinięte białe znaki) z zachowaniem mapowania pozycji
+na oryginał. Indeks n-gramów pozwala znaleźć wszystkie wystąpienia fragmentu
+bez przeszukiwania całego tekstu: sprawdzane są tylko pozycje najrzadszego
+n-gramu fragmentu. Fragmenty, których nie ma w tekście, są odrzucane.
+"""
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+NGRAM = 4
+
+# Znaki zastępowane przed usunięciem diakrytyków
+_TRANSLATE = str.maketrans({
+    "ł": "l", "Ł": "l",
+    "„": '"', "”": '"', "“": '"', "«": '"', "»": '"',
+    "‘": "'", "’": "'", "‚": "'",
+    "–": "-", "—": "-", "‐": "-",
+})
+
+
+@lru_cache(maxsize=4096)
+def _fold(char: str) -> str:
+    """Normalizuje pojedynczy znak (wynik może mieć 0, 1 lub więcej znaków)"""
+    decomposed = unicodedata.normalize("NFD", char.translate(_TRANSLATE).lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize(text: str) -> str:
+    """Normalizuje tekst tak samo jak TextIndex (do porównań fragmentów)"""
+    return " ".join("".join(_fold(c) for c in text).split())
+
+
+class TextIndex:
+    """
+    Znormalizowany tekst z mapowaniem pozycji na oryginał i indeksem n-gramów.
+    Budowany raz na dokument (fragment analizy).
+    """
+
+    def __init__(self, text: str, ngram: int = NGRAM):
+        self.text = text
+        self.ngram = ngram
+        chars: List[str] = []
+        # Pozycja w oryginale: początek i koniec znaku, z którego powstał znak znormalizowany
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        for i, char in enumerate(text):
+            if char.isspace():
+                # Ciąg białych znaków → jedna spacja
+                if chars and chars[-1] != " ":
+                    chars.append(" ")
+                    self.starts.append(i)
+                    self.ends.append(i + 1)
+                continue
+            for folded in _fold(char):
+                chars.append(folded)
+                self.starts.append(i)
+                self.ends.append(i + 1)
+        self.normalized = "".join(chars)
+
+        self.index: Dict[str, List[int]] = {}
+        normalized = self.normalized
+        for pos in range(len(normalized) - ngram + 1):
+            self.index.setdefault(normalized[pos:pos + ngram], []).append(pos)
+
+    def _candidates(self, fragment: str) -> Optional[List[int]]:
+        """Pozycje najrzadszego n-gramu fragmentu (z przesunięciem do początku fragmentu)"""
+        best = None
+        best_offset = 0
+        for offset in range(len(fragment) - self.ngram + 1):
+            positions = self.index.get(fragment[offset:offset + self.ngram])
+            if positions is None:
+                # N-gramu nie ma w tekście - fragmentu też
+                return []
+            if best is None or len(positions) < len(best):
+                best, best_offset = positions, offset
+        if best is None:
+            return None
+        return [pos - best_offset for pos in best if pos >= best_offset]
+
+    def find_all(self, fragment: str,
+                 windows: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, int]]:
+        """
+        Zwraca wszystkie zakresy (start, end) w oryginalnym tekście, w których występuje fragment
+        (po normalizacji, jako całe słowa). Pusta lista oznacza fragment nieistniejący w tekście.
+
+        Args:
+            windows: Ograniczenie do zakresów (start, end) oryginalnego tekstu
+        """
+        needle = normalize(fragment)
+        if not needle:
+            return []
+        length = len(needle)
+        normalized = self.normalized
+
+        candidates = self._candidates(needle)
+        if candidates is None:
+            # Fragment krótszy niż n-gram - wyszukiwanie w znormalizowanym tekście
+            candidates = []
+            pos = normalized.find(needle)
+            while pos != -1:
+                candidates.append(pos)
+                pos = normalized.find(needle, pos + 1)
+
+        spans = []
+        for pos in candidates:
+            # Dopasowanie całych słów - "kot" nie może być częścią "kotlet"
+            if needle[0].isalnum() and pos > 0 and normalized[pos - 1].isalnum():
+                continue
+            end = pos + length
+            if needle[-1].isalnum() and end < len(normalized) and normalized[end].isalnum():
+                continue
+            if normalized.startswith(needle, pos):
+                span = (self.starts[pos], self.ends[end - 1])
+                if windows is None or any(w_start <= span[0] and span[1] <= w_end for w_start, w_end in windows):
+                    spans.append(span)
+        return spans
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger("lematyzator")
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatuje wpisy logu jako pojedyncze linie JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        data = getattr(record, "data", None)
+        if data:
+            entry.update(data)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(path: Optional[str] = None, level: int = logging.INFO) -> logging.Logger:
+    """Konfiguruje strukturalny log JSON (jednokrotnie dla procesu)"""
+    if not any(getattr(handler, "_lematyzator", False) for handler in logger.handlers):
+        handler = logging.FileHandler(path or os.getenv("LOG_PATH", "lematyzator.log"), encoding="utf-8")
+        handler.setFormatter(JsonFormatter())
+        handler._lematyzator = True
+        logger.addHandler(handler)
+        logger.setLevel(level)
+    return logger
+
+
+class Tracer:
+    """
+    Zbiera czasy etapów analizy oraz liczniki (zapytania API, tokeny, ponowienia,
+    trafienia cache). Bezpieczny dla wątków - używany także w puli zapytań GPT.
+    """
+
+    def __init__(self, name: str = "analiza"):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {
+            "api_calls": 0,
+            "tokens_in": 0,
+            "tokens_out": 0,
+            "retries": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "errors": 0,
+        }
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mierzy czas wykonania bloku i dodaje go do etapu o podanej nazwie"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+
+    def add(self, counter: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def record_api_call(self, seconds: float, tokens_in: int, tokens_out: int, retries: int, status: Optional[int]) -> None:
+        """Zapisuje pojedyncze zapytanie do API (również do logu)"""
+        with self._lock:
+            self.counters["api_calls"] += 1
+            self.counters["tokens_in"] += tokens_in
+            self.counters["tokens_out"] += tokens_out
+            self.counters["retries"] += retries
+        self.add_time("gpt_request", seconds)
+        logger.info("api_call", extra={"data": {
+            "trace": self.name, "seconds": round(seconds, 4), "tokens_in": tokens_in,
+            "tokens_out": tokens_out, "retries": retries, "status": status
+        }})
+
+    def merge(self, summary: Dict) -> None:
+        """Dodaje czasy etapów i liczniki z podsumowania innego Tracera (np. z usługi analizy)"""
+        with self._lock:
+            for name, stage in summary.get("stages", {}).items():
+                current = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+                current["calls"] += stage["calls"]
+                current["seconds"] += stage["seconds"]
+            for counter, value in summary.get("counters", {}).items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def summary(self) -> Dict:
+        """Podsumowanie do wyświetlenia, logu i zapisu w historii"""
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self.started, 4),
+                "stages": {
+                    name: {"calls": int(stage["calls"]), "seconds": round(stage["seconds"], 4)}
+                    for name, stage in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def log_summary(self) -> Dict:
+        summary = self.summary()
+        logger.info("trace_summary", extra={"data": {"trace": self.name, **summary}})
+        return summary